@@ -1,4 +1,591 @@
-def generate_preferences(values):
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from fractions import Fraction
+from functools import reduce, wraps
+from itertools import accumulate, chain, compress, groupby, islice, repeat
+from math import factorial, fabs, floor, isnan, lcm, lgamma, log, sqrt
+from multiprocessing.shared_memory import SharedMemory
+from operator import add, lt
+from statistics import NormalDist
+from time import perf_counter, process_time, time
+
+# The Instrumentation collecting timings and counters, None while instrumentation is disabled.
+instrumentation = None
+
+class Instrumentation:
+    """
+    Opt-in timers, counters and hooks for finding out where the time of a run goes.
+
+    Each phase, such as reading the worksheet's rows, generating the preferences, tallying or STV, has its number of calls,
+    wall time and CPU time added up. Counters count the ballots processed, STV rounds, alternatives eliminated and
+    ties, with one counter for each tie-break path taken. Events, such as each STV round with the alternatives
+    it eliminated, each tie and each finished phase, are kept in order and passed to every hook as they happen.
+    Only the work done in this process is seen, not the work of any worker processes.
+
+    Parameters:
+        hooks (list): functions called as hook(event, data) for every event, data being a dictionary.
+        keep_events (bool): if False the events are only passed to the hooks and not kept.
+    """
+    def __init__(self, hooks=None, keep_events=True):
+        self.phases = {}
+        self.counters = Counter()
+        self.events = []
+        self.hooks = list(hooks or [])
+        self.keep_events = keep_events
+
+    def add_hook(self, hook):
+        """
+        Adds a function to be called as hook(event, data) for every event.
+
+        Parameters:
+            hook (function): the function.
+        """
+        self.hooks.append(hook)
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter.
+
+        Parameters:
+            name (str): the name of the counter.
+            amount (int): the amount added.
+        """
+        self.counters[name] += amount
+
+    def record(self, event, **data):
+        """
+        Records an event and passes it to the hooks.
+
+        Parameters:
+            event (str): the name of the event.
+            data: the details of the event, which should be JSON serialisable.
+        """
+        data = {"event": event, **data}
+        if self.keep_events:
+            self.events.append(data)
+        for hook in self.hooks:
+            hook(event, data)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times a phase of the run, adding its wall and CPU time to the phase's totals.
+
+        Parameters:
+            name (str): the name of the phase.
+        """
+        wall = perf_counter()
+        cpu = process_time()
+        try:
+            yield
+        finally:
+            wall = perf_counter() - wall
+            cpu = process_time() - cpu
+            totals = self.phases.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+            totals["calls"] += 1
+            totals["wall"] += wall
+            totals["cpu"] += cpu
+            self.record("phase", name=name, wall=wall, cpu=cpu)
+
+    def to_dict(self):
+        """
+        Returns:
+            report (dict): the "phases" with their calls, wall and CPU times, the "counters" and the "events".
+        """
+        return {"phases": {name: dict(totals) for name, totals in self.phases.items()},
+                "counters": dict(self.counters), "events": list(self.events)}
+
+    def write_json_lines(self, file):
+        """
+        Writes the events, then a line for each phase and each counter, as JSON lines.
+
+        Parameters:
+            file (file or str): a file opened for writing text, or the path of the file to write.
+        """
+        if isinstance(file, str):
+            with open(file, "w") as opened:
+                return self.write_json_lines(opened)
+        for event in self.events:
+            file.write(json.dumps(event) + "\n")
+        for name, totals in self.phases.items():
+            file.write(json.dumps({"phase": name, **totals}) + "\n")
+        for name, value in self.counters.items():
+            file.write(json.dumps({"counter": name, "value": value}) + "\n")
+
+def enable_instrumentation(hooks=None, keep_events=True):
+    """
+    Starts collecting timings and counters, replacing any collected so far.
+
+    Parameters:
+        hooks (list): functions called as hook(event, data) for every event.
+        keep_events (bool): if False the events are only passed to the hooks and not kept.
+
+    Returns:
+        instrumentation (Instrumentation): the new collector, its to_dict() or write_json_lines() give the results.
+    """
+    global instrumentation
+    instrumentation = Instrumentation(hooks, keep_events)
+    return instrumentation
+
+def disable_instrumentation():
+    """
+    Stops collecting timings and counters.
+
+    Returns:
+        instrumentation (Instrumentation): the collector that was in use, or None.
+    """
+    global instrumentation
+    collector, instrumentation = instrumentation, None
+    return collector
+
+def phase(name):
+    """
+    Times a phase where instrumentation is enabled, otherwise does nothing.
+
+    Parameters:
+        name (str): the name of the phase.
+
+    Returns:
+        context (context manager): used as "with phase(name):".
+    """
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.phase(name)
+
+def instrumented(name):
+    """
+    A decorator timing every call of a function as a phase where instrumentation is enabled.
+
+    While disabled the only cost is one extra call and a check of the instrumentation global.
+
+    Parameters:
+        name (str): the name of the phase.
+
+    Returns:
+        decorator (function): the decorator.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if instrumentation is None:
+                return function(*args, **kwargs)
+            with instrumentation.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def smallest_typecode(m):
+    """
+    Finds the smallest unsigned integer array typecode that can hold the alternatives 1 to m.
+
+    Parameters:
+        m (int): the number of alternatives.
+
+    Returns:
+        typecode (str): an array module typecode, "B" (1 byte), "H" (2 bytes) or "I"/"L" (4 bytes or more).
+    """
+    for typecode in ("B", "H", "I", "L"):
+        if m < 2 ** (8 * array(typecode).itemsize):
+            return typecode
+    raise ValueError(f"{m} alternatives is too many for a preference profile.")
+
+class PreferenceProfile(Mapping):
+    """
+    A compact preference profile backed by one contiguous n x m integer array.
+
+    The rankings of every agent are stored row by row in a single array using the smallest
+    typecode that fits m, instead of a dictionary of Python lists. The inverse permutation,
+    i.e. the position of each alternative in each agent's ranking, is precomputed alongside it.
+    The profile behaves like the preferences dictionary returned by generate_preferences(),
+    so profile[1] is agent 1's ranked list of alternatives and every voting rule accepts it.
+
+    Parameters:
+        rankings (array): the flat row-major rankings, alternatives numbered 1 to m.
+        m (int): the number of alternatives.
+        agents (list): optional agent labels in row order, by default the agents are 1 to n.
+        positions (array): optional precomputed positions, computed from rankings if not given.
+
+    Attributes:
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+        rows (int): the number of rankings stored, n unless the profile is an AnonymousProfile.
+        weights (array): the number of agents behind each stored ranking, None when every ranking is one agent's.
+        rankings (array): rankings[i * m + j] is the alternative agent i ranks at position j (0 is first).
+        positions (array): positions[i * m + a - 1] is the position of alternative a in agent i's ranking.
+        range_totals (dict): the sum of each alternative's values where the profile was read with stream_preferences(), otherwise None.
+        valuations (memoryview): the raw n x m values from the worksheet where the profile was loaded with them, otherwise None.
+        filename (str): the profile file the arrays are mapped from where the profile came from load_profile(), otherwise None.
+    """
+    def __init__(self, rankings, m, agents=None, positions=None):
+        if m < 1 or len(rankings) % m != 0:
+            raise ValueError("The rankings do not form an n x m matrix.")
+        self.rankings = rankings
+        self.m = m
+        self.rows = len(rankings) // m
+        self.n = self.rows
+        self.weights = None
+        self.agents = agents
+        if agents is not None:
+            if len(agents) != self.n:
+                raise ValueError("The number of agents does not match the number of rankings.")
+            self.agent_indices = {agent: index for index, agent in enumerate(agents)}
+        if positions is None:
+            positions = invert_rankings(rankings, m)
+        self.positions = positions
+        self.range_totals = None
+        self.valuations = None
+        self.filename = None
+
+    @classmethod
+    def from_dict(cls, preferences):
+        """
+        Builds a profile from a preferences dictionary such as the one returned by generate_preferences().
+
+        Parameters:
+            preferences (dict): a dictionary of agents and preferences.
+
+        Returns:
+            profile (PreferenceProfile): the same preferences stored in a single array.
+        """
+        m = len(next(iter(preferences.values())))
+        rankings = array(smallest_typecode(m))
+        for preferences_list in preferences.values():
+            if len(preferences_list) != m:
+                raise ValueError("Every agent must rank the same number of alternatives.")
+            rankings.extend(preferences_list)
+        agents = list(preferences)
+        if agents == list(range(1, len(agents) + 1)):
+            agents = None
+        return cls(rankings, m, agents)
+
+    def row(self, agent):
+        """
+        Finds the row of the rankings array which holds an agent's preferences.
+
+        Parameters:
+            agent (int): the agent.
+
+        Returns:
+            row (int): the row index, a KeyError is raised if the agent does not exist.
+        """
+        if self.agents is None:
+            if isinstance(agent, int) and 1 <= agent <= self.n:
+                return agent - 1
+            raise KeyError(agent)
+        return self.agent_indices[agent]
+
+    def __getitem__(self, agent):
+        row_start = self.row(agent) * self.m
+        return self.rankings[row_start:row_start + self.m].tolist()
+
+    def __iter__(self):
+        if self.agents is None:
+            return iter(range(1, self.n + 1))
+        return iter(self.agents)
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, agent):
+        try:
+            self.row(agent)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def position(self, agent, alternative):
+        """
+        The position of an alternative in an agent's ranking, where 0 is the most preferred.
+
+        Parameters:
+            agent (int): the agent.
+            alternative (int): the alternative.
+
+        Returns:
+            position (int): the position of the alternative.
+        """
+        return self.positions[self.row(agent) * self.m + alternative - 1]
+
+    def to_dict(self):
+        """
+        Converts the profile back into a preferences dictionary of lists.
+
+        Returns:
+            preferences (dict): a dictionary of agents and preferences.
+        """
+        return {agent: self[agent] for agent in self}
+
+class AnonymousProfile(PreferenceProfile):
+    """
+    A preference profile which stores each distinct ranking once, with the number of agents who gave it.
+
+    Real electorates give far fewer distinct rankings than there are agents, with 5 alternatives there are
+    at most 120, so the voting rules work over the weighted rankings instead of every agent's.
+    The ranking class of every agent is kept too, so the profile still behaves like the preferences dictionary
+    and tie-breaking by an agent's preferences works as before. Fractional score vectors such as harmonic still add
+    one score per agent, in agent order, so their floating point totals are the same as the agent by agent totals.
+
+    Parameters:
+        rankings (array): the flat row-major distinct rankings, alternatives numbered 1 to m.
+        m (int): the number of alternatives.
+        weights (array): the number of agents who gave each ranking.
+        agent_classes (array): the row of each agent's ranking, in agent order.
+        agents (list): optional agent labels in agent order, by default the agents are 1 to n.
+        positions (array): optional precomputed positions, computed from rankings if not given.
+        agent_order (bool): whether agent_classes are the agents the weights count. If False, as for a bootstrap
+        resample which keeps the original agents for tie-breaking, the weighted agents are taken ranking by ranking.
+    """
+    def __init__(self, rankings, m, weights, agent_classes, agents=None, positions=None, agent_order=True):
+        super().__init__(rankings, m, positions=positions)
+        if len(weights) != self.rows:
+            raise ValueError("There must be one weight per ranking.")
+        self.weights = weights
+        self.agent_classes = agent_classes
+        self.agent_order = agent_order
+        self.n = len(agent_classes)
+        self.agents = agents
+        if agents is not None:
+            if len(agents) != self.n:
+                raise ValueError("The number of agents does not match the number of agent classes.")
+            self.agent_indices = {agent: index for index, agent in enumerate(agents)}
+
+    @classmethod
+    def from_profile(cls, preferences):
+        """
+        Builds an anonymous profile by hashing the rankings of a profile or preferences dictionary.
+
+        Parameters:
+            preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+
+        Returns:
+            profile (AnonymousProfile): the same preferences with each distinct ranking stored once, a profile
+            which is already anonymous is returned as it is.
+        """
+        if isinstance(preferences, AnonymousProfile):
+            return preferences
+        profile = as_profile(preferences)
+        builder = AnonymousProfileBuilder(profile.m)
+        for row in range(profile.rows):
+            builder.add(profile.rankings[row * profile.m:(row + 1) * profile.m].tolist())
+        return builder.profile(profile.agents)
+
+    def row(self, agent):
+        """
+        Finds the row of the rankings array which holds an agent's ranking class.
+
+        Parameters:
+            agent (int): the agent.
+
+        Returns:
+            row (int): the row index, a KeyError is raised if the agent does not exist.
+        """
+        return self.agent_classes[super().row(agent)]
+
+class AnonymousProfileBuilder:
+    """
+    Collects rankings one at a time into the distinct rankings, weights and agent classes of an AnonymousProfile.
+
+    Parameters:
+        m (int): the number of alternatives.
+    """
+    def __init__(self, m):
+        self.m = m
+        self.classes = {}
+        self.rankings = array(smallest_typecode(m))
+        self.weights = array("Q")
+        self.agent_classes = array("L")
+
+    def add(self, preferences_list):
+        """
+        Adds the next agent's ranking.
+
+        Parameters:
+            preferences_list (list): the alternatives ranked from most to least preferred.
+        """
+        key = tuple(preferences_list)
+        ranking_class = self.classes.get(key)
+        if ranking_class is None:
+            ranking_class = len(self.weights)
+            self.classes[key] = ranking_class
+            self.rankings.extend(preferences_list)
+            self.weights.append(0)
+        self.weights[ranking_class] += 1
+        self.agent_classes.append(ranking_class)
+
+    def profile(self, agents=None):
+        """
+        The profile of the rankings added so far.
+
+        Parameters:
+            agents (list): optional agent labels in the order the rankings were added.
+
+        Returns:
+            profile (AnonymousProfile): the anonymous profile.
+        """
+        if not self.weights:
+            raise ValueError("There are no agents.")
+        return AnonymousProfile(self.rankings, self.m, self.weights, self.agent_classes, agents)
+
+class TruncatedProfile(Mapping):
+    """
+    A profile of truncated ballots, where each agent ranks only their top few alternatives.
+
+    The ranked alternatives of every agent are stored one after another in a single entries array, with each
+    ballot's length, so the memory used is proportional to the number of ranked entries rather than n * m.
+    A parallel positions array holds the position of each entry in its ballot, from which the column of every
+    agent's j-th choice is made the first time a tally needs it. Every alternative an agent does not rank is tied below the ones
+    they do rank: it scores the profile's unranked score (0 by default) in the positional rules and is never
+    reached by their ballot in STV, which is exhausted once all of its ranked alternatives are eliminated.
+
+    Parameters:
+        entries (array): the ranked alternatives of every agent, agent by agent.
+        lengths (array): the number of alternatives each agent ranks.
+        m (int): the number of alternatives.
+        agents (list): the agent numbers, by default 1 to n.
+        unranked (int or float): the score of an unranked alternative in the positional rules.
+
+    Attributes:
+        starts (array): the index in entries of each agent's first choice, with the total number of entries at the end.
+        positions (array): the position of each entry in its agent's ballot.
+        columns (dict): the columns made so far, the positions as keys and arrays of the alternatives there as values.
+    """
+    def __init__(self, entries, lengths, m, agents=None, unranked=0):
+        self.entries = entries
+        self.lengths = lengths
+        self.m = m
+        self.n = len(lengths)
+        self.unranked = unranked
+        self.starts = array("Q", accumulate(lengths, initial=0))
+        if self.starts[-1] != len(entries):
+            raise ValueError("The ballot lengths do not add up to the number of entries.")
+        self.positions = array(smallest_typecode(m))
+        for length in lengths:
+            self.positions.extend(range(length))
+        self.agents = agents
+        self.agent_indices = None if agents is None else {agent: index for index, agent in enumerate(agents)}
+        self.columns = {}
+
+    def column(self, position):
+        """
+        The alternatives every agent ranks at a position, for the agents whose ballots are that long.
+
+        Parameters:
+            position (int): the position, 0 is first.
+
+        Returns:
+            column (array): the alternatives, in agent order.
+        """
+        if position not in self.columns:
+            self.columns[position] = array(self.entries.typecode, compress(self.entries, map(position.__eq__, self.positions)))
+        return self.columns[position]
+
+    @classmethod
+    def from_dict(cls, preferences, m, unranked=0):
+        """
+        Builds a profile from a dictionary of agents and their (possibly partial) rankings.
+
+        Parameters:
+            preferences (dict): a dictionary of agents and preferences, each a list of distinct alternatives.
+            m (int): the number of alternatives.
+            unranked (int or float): the score of an unranked alternative in the positional rules.
+
+        Returns:
+            profile (TruncatedProfile): the same preferences stored sparsely.
+        """
+        entries = array(smallest_typecode(m))
+        lengths = array(smallest_typecode(m))
+        for preferences_list in preferences.values():
+            if len(set(preferences_list)) != len(preferences_list) or not all(1 <= alternative <= m for alternative in preferences_list):
+                raise ValueError(f"A ballot must rank distinct alternatives from 1 to {m}.")
+            entries.extend(preferences_list)
+            lengths.append(len(preferences_list))
+        agents = list(preferences)
+        if agents == list(range(1, len(agents) + 1)):
+            agents = None
+        return cls(entries, lengths, m, agents, unranked)
+
+    def row(self, agent):
+        """
+        Finds the ballot index of an agent.
+
+        Parameters:
+            agent (int): the agent.
+
+        Returns:
+            row (int): the ballot index, a KeyError is raised if the agent does not exist.
+        """
+        if self.agents is None:
+            if isinstance(agent, int) and 1 <= agent <= self.n:
+                return agent - 1
+            raise KeyError(agent)
+        return self.agent_indices[agent]
+
+    def __getitem__(self, agent):
+        row = self.row(agent)
+        return self.entries[self.starts[row]:self.starts[row + 1]].tolist()
+
+    def __iter__(self):
+        if self.agents is None:
+            return iter(range(1, self.n + 1))
+        return iter(self.agents)
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, agent):
+        try:
+            self.row(agent)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+def invert_rankings(rankings, m):
+    """
+    Computes the positions array, the inverse permutation of each agent's ranking.
+
+    Parameters:
+        rankings (array): the flat row-major rankings, alternatives numbered 1 to m.
+        m (int): the number of alternatives.
+
+    Returns:
+        positions (array): positions[i * m + a - 1] is the position of alternative a in agent i's ranking.
+    """
+    positions = array(smallest_typecode(m), bytes(len(rankings) * array(smallest_typecode(m)).itemsize))
+    for index, alternative in enumerate(rankings):
+        row_start = index - index % m
+        positions[row_start + alternative - 1] = index - row_start
+    return positions
+
+def alternatives_count(preferences):
+    """
+    The number of alternatives in a preference profile.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): a preference profile.
+
+    Returns:
+        m (int): the number of alternatives.
+    """
+    if isinstance(preferences, (PreferenceProfile, TruncatedProfile)):
+        return preferences.m
+    return len(next(iter(preferences.values())))
+
+@instrumented("generate_preferences")
+def generate_preferences(values, profile=False):
     """
     Gets the preferences from the worksheet, outputs a preference profile.
 
@@ -10,37 +597,164 @@ def generate_preferences(values):
     Parameters:
         values (openpyxl worksheet): the numerical values each agent assigns to the alternatives
         (a higher value means an alternative is more preferred).
+        profile (bool): if True a PreferenceProfile is returned instead of a dictionary.
 
     Returns:
         preferences (dict): a dictionary of agents and preferences. An example entry would be 1: [2, 4, 1, 3]
         where the key '1:' is Agent 1 and the values [2, 4, 1, 3] are their preferred alternatives ranked
         where the order in that list of values is congruous with the order of the values in the worksheet.
+        or
+        preferences (PreferenceProfile): the same preferences stored in a single array, where profile is True.
     """
     preferences = {}
+    rankings = None
     # First agent is 1. Loops through the worksheet's rows to create the dictionary in the needed format.
     agent = 1
+    if profile:
+        # Ranks the rows a block at a time straight into the rankings array.
+        rows = values.iter_rows(values_only=True)
+        while True:
+            with phase("read_rows"):
+                chunk = list(islice(rows, 4096))
+            if not chunk:
+                break
+            if rankings is None:
+                rankings = array(smallest_typecode(len(chunk[0])))
+                m = len(chunk[0])
+            rank_valuations(chunk, rankings)
+        if rankings is None:
+            raise ValueError("The worksheet has no agents.")
+        if instrumentation is not None:
+            instrumentation.count("ballots_read", len(rankings) // m)
+        return PreferenceProfile(rankings, m)
     for row in values.iter_rows(values_only=True):
-        # Makes each row of agent's valuations into a list.
-        valuation_list = list(row)
-        preferences_list = []
-        valuation_list_dictionary = {}
-        # Builds the valuation_list_dictionary where the key is the valuation of an alternative
-        # and the values are their indices in the valuation_list, it is then sorted by valuation from largest to smallest.
-        for index, valuation in enumerate(valuation_list):
-            valuation_list_dictionary.setdefault(valuation, []).append(index + 1)
-        valuation_list_dictionary_sorted = dict(sorted(valuation_list_dictionary.items(), reverse=True))
-        # Goess through each list in each value in the dictionary and sorts them largest to smallest.
-        # This accounts for duplicate valuations. Then it constructs the list of preferences.
-        for agent_valuation_list in valuation_list_dictionary_sorted:
-            agent_valuation_list_sorted = valuation_list_dictionary_sorted[agent_valuation_list]
-            agent_valuation_list_sorted.sort(reverse=True)
-            # This append to preferences_list the sorted lists which are the values in the dictionary.
-            preferences_list = preferences_list + valuation_list_dictionary_sorted[agent_valuation_list]
         # Adds the agent and their preferences_list to the preferences dictionary.
-        preferences[agent] = preferences_list
+        preferences[agent] = valuations_to_preferences(row)
         agent = agent + 1
+    if instrumentation is not None:
+        instrumentation.count("ballots_read", agent - 1)
     return preferences
 
+def valuations_to_preferences(row):
+    """
+    Turns one agent's row of valuations into their ranked list of alternatives.
+
+    Alternatives with a higher valuation are ranked higher. Alternatives with the same valuation
+    are ranked from the highest numbered alternative to the lowest.
+
+    Parameters:
+        row (tuple): the values one agent assigns to the alternatives, in worksheet column order.
+
+    Returns:
+        preferences_list (list): the alternatives ranked from most to least preferred, e.g. [2, 4, 1, 3].
+    """
+    # Sorting the alternatives from the highest numbered down keeps equal valuations in that order, as the sort is stable.
+    alternative_indices = sorted(range(len(row) - 1, -1, -1), key=row.__getitem__, reverse=True)
+    return [index + 1 for index in alternative_indices]
+
+def rank_valuations(rows, rankings):
+    """
+    Ranks a block of agents' rows of valuations at once, adding the rankings onto a rankings array.
+
+    Each row is ranked with one stable sort, as in valuations_to_preferences(), then the whole block is
+    renumbered from column indices to alternatives and added to the array in one step.
+
+    Parameters:
+        rows (list): the rows of values, each a tuple in worksheet column order.
+        rankings (array): the flat rankings array the block's rankings are added to.
+    """
+    alternative_indices = []
+    for row in rows:
+        alternative_indices.extend(sorted(range(len(row) - 1, -1, -1), key=row.__getitem__, reverse=True))
+    rankings.extend(map((1).__add__, alternative_indices))
+
+@instrumented("open_worksheet")
+def open_worksheet(filename, sheet=None):
+    """
+    Opens a worksheet from an .xlsx file in openpyxl's read-only mode.
+
+    In read-only mode openpyxl parses the rows lazily as they are iterated over,
+    so the whole worksheet is never held in memory. openpyxl is only imported when this is called.
+
+    Parameters:
+        filename (str): the path of the .xlsx file.
+        sheet (str): the name of the worksheet, by default the active worksheet.
+
+    Returns:
+        values (openpyxl read-only worksheet): the worksheet, its workbook is values.parent.
+    """
+    import openpyxl
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    if sheet is None:
+        return workbook.active
+    return workbook[sheet]
+
+def worksheet_chunks(values, chunk_size=4096):
+    """
+    Reads the rows of a worksheet exactly once, in chunks of rows.
+
+    Parameters:
+        values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file which is opened with open_worksheet().
+        chunk_size (int): the number of rows in each chunk.
+
+    Yields:
+        chunk (list): a list of up to chunk_size rows, each row a tuple of values.
+    """
+    opened = not hasattr(values, "iter_rows")
+    if opened:
+        values = open_worksheet(values)
+    try:
+        rows = values.iter_rows(values_only=True)
+        while True:
+            # openpyxl parses the rows as they are read, so this is where the parsing time goes.
+            with phase("read_rows"):
+                chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if instrumentation is not None:
+                instrumentation.count("ballots_read", len(chunk))
+            yield chunk
+    finally:
+        if opened:
+            values.parent.close()
+
+@instrumented("stream_preferences")
+def stream_preferences(values, chunk_size=4096, anonymous=False):
+    """
+    Reads a worksheet once, building the PreferenceProfile and the range voting totals together.
+
+    The rows are read in chunks, each chunk is ranked into the profile's rankings array and its
+    values are added to the running totals of each alternative, then the chunk is discarded.
+
+    Parameters:
+        values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file.
+        chunk_size (int): the number of rows read at a time.
+        anonymous (bool): if True the rankings are hashed as they are read and an AnonymousProfile is returned.
+
+    Returns:
+        profile (PreferenceProfile): the preferences, with the sum of each alternative's values in profile.range_totals.
+    """
+    rankings = None
+    range_totals = None
+    for chunk in worksheet_chunks(values, chunk_size):
+        if rankings is None:
+            m = len(chunk[0])
+            rankings = AnonymousProfileBuilder(m) if anonymous else array(smallest_typecode(m))
+            range_totals = [0] * m
+        if anonymous:
+            for row in chunk:
+                rankings.add(valuations_to_preferences(row))
+        else:
+            rank_valuations(chunk, rankings)
+        # Adds each column of the chunk onto its running total, one agent at a time.
+        for index, column in enumerate(zip(*chunk)):
+            range_totals[index] = reduce(add, column, range_totals[index])
+    if rankings is None:
+        raise ValueError("The worksheet has no agents.")
+    profile = rankings.profile() if anonymous else PreferenceProfile(rankings, m)
+    profile.range_totals = {alternative: total for alternative, total in enumerate(range_totals, 1)}
+    return profile
+
 def points_tally(preferences):
     """
     This tallies the points for each alternative where a voting rule inputs a preference profile.
@@ -51,14 +765,14 @@ def points_tally(preferences):
     Thus, the range_voting function which does not input a preference_profile uses an alternative points tally within its function.
 
     Parameters:
-        preferences (dict): a dictionary of agents and preferences.
+        preferences (dict/PreferenceProfile): a dictionary of agents and preferences.
 
     Returns:
         points (dict): a dictionary where alternatives are the keys and the points are the values.
     """
     points = {}
     alternative_key = 1
-    while alternative_key <= len(preferences[1]):
+    while alternative_key <= alternatives_count(preferences):
         points[alternative_key] = 0
         alternative_key = alternative_key + 1
     return points
@@ -92,22 +806,29 @@ def tie_breaker(preferences, tie_break, high_scores_list):
     A tie-break is decided by either: the "max" rule where the alternative with the highest number is the winner.
     The "min" rule where the alternative with the lowest number is the winner.
     The agent i rule where the alternative which is ranked highest in agent i's preferences is the winner.
+    If agent i's truncated ballot ranks none of the tied alternatives, the one with the lowest number wins.
 
     Parameters:
-        preferences (dict/openpyxl worksheet): either the preferences dictionary from the generate_preferences function
-        or for the range_voting function the values from the openpyxl worksheet.
+        preferences (dict/PreferenceProfile): the preferences from the generate_preferences function.
         tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an error is raised.
         high_scores_list (list): a list of tied alternatives for a voting rule function.
 
     Returns:
         winner (int): the winning alternative for a voting rule when a tie-break is necessary.
     """
+    if instrumentation is not None:
+        path = "agent" if isinstance(tie_break, int) else tie_break
+        instrumentation.count("ties")
+        instrumentation.count(f"ties_{path}")
+        instrumentation.record("tie", path=path, tied=[int(alternative) for alternative in high_scores_list])
     try:
         if isinstance(tie_break, int) is True:
             for agent_i_alternative in preferences[tie_break]:
                 if agent_i_alternative in high_scores_list:
                     winner = agent_i_alternative
                     break
+            else:
+                winner = min(high_scores_list)
         elif tie_break == "min":
             winner = min(high_scores_list)
         elif tie_break == "max":
@@ -123,149 +844,229 @@ def dictatorship(preferences, agent):
     An agent is selected, the winner is the one that agent ranks first.
 
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
         agent (int): the number of the agent. An error message is printed if the number does not correspond to an agent.
 
     Returns:
         winner (int): the winning alternative.
     """
     if agent in preferences:
-        # Iterates through the dictionary to find the agent, returns their first choice.
-        for agent_profile in preferences:
-            if agent_profile == agent:
-                return int(preferences[agent_profile][0])
-            else:
-                pass
+        # Looks the agent up directly, returns their first choice.
+        return int(preferences[agent][0])
     else:
         raise ValueError(f"Inputted integer {agent} does not correspond to an agent.")
 
-def scoring_rule(preferences, score_vector, tie_break):
+def as_profile(preferences):
     """
-    The winner is the alternative with the highest score.
+    Makes sure the preferences are held in a PreferenceProfile.
 
-    The score_vector gives a score to each alternative in each agent's preferences.
-    For each agent, the highest score is given to the top ranked alternative and so on.
-    The score_vector must be the same number of scores as the number of alternatives, or an error is given.
-    It then sums the scores for each alternative and returns the winner.
-    A tie-breaking rule is used in the event of a draw.
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+
+    Returns:
+        profile (PreferenceProfile): the preferences themselves if already a profile, otherwise a copy in a profile.
+    """
+    if isinstance(preferences, PreferenceProfile):
+        return preferences
+    return PreferenceProfile.from_dict(preferences)
+
+def is_integral(score_vector):
+    """
+    Checks whether every score in a score vector is a whole number.
 
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
-        score_vector (list of floats): the scores to be given to the alternatives.
-        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an error is raised.
+        score_vector (list): the scores given to each position.
 
     Returns:
-        winner (int): the winning alternative.
-        or
-        False: where the score_vector does not have the same number of scores as the number of alternatives.
+        integral (bool): True if every score is a whole number.
     """
-    # Checks if the score vector's length is the same as the number of alternatives.
-    if len(preferences[1]) == len(score_vector):
-        # Populates the keys (alternatives) in the points dictionary.
-        points = points_tally(preferences)
-        # Populates the values (total scores) in the points dictionary.
-        for agent_profile in preferences:
-            preference_score_list = zip(preferences[agent_profile], sorted(score_vector, reverse=True))
-            for preference_tuple_value, score_tuple_value in list(preference_score_list):
-                points[preference_tuple_value] += score_tuple_value
-        # Finds the high score, then the alternative(s) with that score.
-        high_scores_list = tie_checker(points)
-        # Identifies if there is a tie, if so calls the tie_breaker function.
-        if len(high_scores_list) > 1:
-            winner = tie_breaker(preferences, tie_break, high_scores_list)
-        else:
-            winner = high_scores_list[0]
-        return int(winner)
-    else:
-        print("Incorrect input")
-        return False
+    for score in score_vector:
+        if not (isinstance(score, int) or float(score).is_integer()):
+            return False
+    return True
 
-def plurality(preferences, tie_break):
+def position_counts(preferences, position, counts=None):
     """
-    The winner is the alternative which appears the most in the first positions of agents' preferences.
+    Counts how many agents rank each alternative at a given position.
 
-    Finds the alternative which is ranked first for each agent.
-    Then identifies which alternative(s) appear the most out of those.
-    A tie-breaking rule is used in the event of a draw.
+    This is a bincount over one column of the rankings array, the counting itself runs in C.
 
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
-        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        position (int): the position in the rankings, 0 is first and -1 is last.
+        counts (dict): optional cache of the counts already made, keyed by position, which this count is added to.
 
     Returns:
-        winner (int): the winning alternative.
+        counts (Counter): the alternatives as keys and the number of agents ranking them at that position as values.
     """
-    # Populates the keys (alternatives) in the points dictionary.
-    points = points_tally(preferences)
-    # Gets the first ranked alternative of each agent.
-    ranked_first = []
-    for agent in preferences:
-        ranked_first.append(preferences[agent][0])
-        # Finds how many times each alternative was an agent's first rank.
-        ranked_first_preference = 0
-        for ranked_first_preference in ranked_first:
-            points[preferences[agent][0]] = ranked_first.count(ranked_first_preference)
-    # Finds the high score, then the alternative(s) with that score.
-    high_scores_list = tie_checker(points)
-    # Identifies if there is a tie, if so calls the tie_breaker function.
-    if len(high_scores_list) > 1:
-        winner = tie_breaker(preferences, tie_break, high_scores_list)
+    profile = as_profile(preferences)
+    position = position % profile.m
+    if counts is not None and position in counts:
+        return counts[position]
+    column = profile.rankings[position::profile.m]
+    if profile.weights is None:
+        column_counts = Counter(column)
     else:
-        winner = high_scores_list[0]
-    return int(winner)
+        column_counts = Counter()
+        for alternative, weight in zip(column, profile.weights):
+            column_counts[alternative] += weight
+    if counts is not None:
+        counts[position] = column_counts
+    return column_counts
 
-def veto(preferences, tie_break):
+@instrumented("tally")
+def positional_tally(preferences, score_vector, counts=None, processes=None, exact=False):
     """
-    The winner is the alternative with the most points, where every alternative apart from the last ranked one gets 1 point.
+    Tallies the points of every alternative for a positional scoring rule.
 
-    Each alternative in an agent's preferences receives 1 point, apart from each last ranked alternative.
-    The alternative with the most points is the winner. A tie-breaking rule is used in the event of a draw.
+    The alternative at position j in an agent's preferences receives score_vector[j] points.
+    This is the shared engine behind scoring_rule, plurality, veto, borda and harmonic and works in O(n * m).
+    When every score is a whole number the points are a weighted sum of the position counts, where
+    only the positions whose score differs from the most common score need to be counted.
+    Otherwise each alternative's points are added up one agent at a time, in agent order, from the positions
+    array, so the floating point totals (and therefore the ties tie_checker finds) are the same as adding them by hand.
+
+    Where exact is True the scores are scaled to whole numbers with a common denominator by integer_score_vector(),
+    tallied from the position counts with Python's unbounded integers, and divided back into Fractions, so the totals
+    and their ties are exact. Scores may be ints, Fractions, Decimals, strings such as "1/3" or floats, a float being
+    taken at its exact binary value. Scores which are not rational numbers fall back: infinite scores are tallied
+    with floats as though exact were False, and a NaN score raises a ValueError, as no alternative could be said to win.
 
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
-        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        score_vector (list): the score for each position, score_vector[0] is given to the first ranked alternative.
+        counts (dict): optional cache of position counts shared between tallies, see position_counts().
+        processes (int): if more than 1, the tally is split across a pool of this many processes, see parallel_tally().
+        exact (bool): if True the points are tallied exactly, as whole numbers or Fractions.
 
     Returns:
-        winner (int): the winning alternative.
+        points (dict): a dictionary where alternatives are the keys and the points are the values.
     """
-    # Populates the keys (alternatives) in the points dictionary.
-    points = points_tally(preferences)
-    # Populates the values (total scores) in the points dictionary.
-    for agent in preferences:
-        preferences_list = preferences[agent]
-        for alternative in preferences_list[0:-1]:
-            points[alternative] += 1
-    # Finds the high score, then the alternative(s) with that score.
-    high_scores_list = tie_checker(points)
-    # Identifies if there is a tie, if so calls the tie_breaker function.
-    if len(high_scores_list) > 1:
-        winner = tie_breaker(preferences, tie_break, high_scores_list)
+    if isinstance(preferences, TruncatedProfile):
+        return truncated_tally(preferences, score_vector, exact)
+    profile = as_profile(preferences)
+    m = profile.m
+    if len(score_vector) != m:
+        raise ValueError("The score vector must have one score per alternative.")
+    if exact:
+        try:
+            scores, denominator = integer_score_vector(score_vector)
+        except (ValueError, OverflowError):
+            if any(isnan(float(score)) for score in score_vector):
+                raise ValueError("A score vector with a NaN score has no winner.")
+            score_vector = [float(score) for score in score_vector]
+        else:
+            points = positional_tally(profile, scores, counts, processes)
+            if denominator == 1:
+                return points
+            return {alternative: Fraction(total, denominator) for alternative, total in points.items()}
+    if instrumentation is not None:
+        instrumentation.count("ballots_tallied", profile.n)
+    if processes is not None and processes > 1 and profile.weights is None:
+        return parallel_tally(profile, score_vector, processes, counts)
+    if is_integral(score_vector):
+        # Every alternative starts with the most common score from every agent, then the
+        # positions with a different score add the difference for each agent ranking an alternative there.
+        base_score = Counter(score_vector).most_common(1)[0][0]
+        points = dict.fromkeys(range(1, m + 1), base_score * profile.n)
+        for position, score in enumerate(score_vector):
+            if score != base_score:
+                for alternative, count in position_counts(profile, position, counts).items():
+                    points[alternative] += (score - base_score) * count
     else:
-        winner = high_scores_list[0]
-    return int(winner)
+        points = alternative_points(profile, score_vector, range(1, m + 1))
+    return points
 
-def borda(preferences, tie_break):
+def truncated_tally(profile, score_vector, exact=False):
     """
-    The winner is the alternative with the most points according to the borda voting rule.
+    Tallies a positional scoring rule over truncated ballots, in time proportional to the number of ranked entries.
 
-    An agent's alternative at position j receives a score of m - j where m is the number of alternatives.
-    The alternative with the highest score is the winner. A tie-breaking rule is used in the event of a draw.
+    An alternative at position j of a ballot scores score_vector[j], an alternative a ballot does not rank scores
+    profile.unranked. Every alternative starts with the unranked score from every agent, then the count of each
+    alternative in the column of j-th choices adds the difference, skipping the positions scoring the same as
+    an unranked alternative, so plurality only counts first choices. With the unranked score of 0 the plurality
+    vector counts first choices and the veto vector gives a point to every ranked alternative except the last of a
+    complete ballot, so the alternatives a ballot leaves out share its last place.
+
+    Parameters:
+        profile (TruncatedProfile): the truncated ballots.
+        score_vector (list): the score for each position, at least as long as the longest ballot.
+        exact (bool): if True the scores are scaled to whole numbers and the points are exact, with the same fallback
+        for infinite and NaN scores as positional_tally().
+
+    Returns:
+        points (dict): a dictionary where alternatives are the keys and the points are the values.
+    """
+    if profile.n and len(score_vector) < max(profile.lengths):
+        raise ValueError("The score vector must have a score for every position of the longest ballot.")
+    unranked = profile.unranked
+    denominator = 1
+    if exact:
+        # Falls back as positional_tally() does: infinite scores are tallied with floats and a NaN score has no winner.
+        try:
+            scores, denominator = integer_score_vector(list(score_vector) + [unranked])
+        except (ValueError, OverflowError):
+            if any(isnan(float(score)) for score in list(score_vector) + [unranked]):
+                raise ValueError("A score vector with a NaN score has no winner.")
+            score_vector, unranked = [float(score) for score in score_vector], float(unranked)
+        else:
+            score_vector, unranked = scores[:-1], scores[-1]
+    points = dict.fromkeys(range(1, profile.m + 1), unranked * profile.n)
+    if instrumentation is not None:
+        instrumentation.count("ballots_tallied", profile.n)
+    for position in range(max(profile.lengths, default=0)):
+        if score_vector[position] != unranked:
+            for alternative, count in Counter(profile.column(position)).items():
+                points[alternative] += (score_vector[position] - unranked) * count
+    if denominator != 1:
+        return {alternative: Fraction(total, denominator) for alternative, total in points.items()}
+    return points
+
+def alternative_points(profile, score_vector, alternatives):
+    """
+    Adds up the points of some alternatives one agent at a time, in agent order.
+
+    For an AnonymousProfile each ranking's score is looked up once, then added once per agent, in the agent order
+    of agent_classes, so the floating point totals are the same as for the agent by agent profile. Where the
+    profile has no agent order the agents are taken ranking by ranking, weight times each.
+
+    Parameters:
+        profile (PreferenceProfile): the preferences.
+        score_vector (list): the score for each position, score_vector[0] is given to the first ranked alternative.
+        alternatives (iterable): the alternatives to tally.
+
+    Returns:
+        points (dict): the alternatives as keys and their points as values.
+    """
+    points = {}
+    for alternative in alternatives:
+        alternative_positions = profile.positions[alternative - 1::profile.m]
+        scores = map(score_vector.__getitem__, alternative_positions)
+        if profile.weights is not None:
+            ranking_scores = list(scores)
+            if profile.agent_order:
+                scores = map(ranking_scores.__getitem__, profile.agent_classes)
+            else:
+                scores = chain.from_iterable(map(repeat, ranking_scores, profile.weights))
+        points[alternative] = reduce(add, scores, 0)
+    return points
+
+def positional_winner(preferences, score_vector, tie_break, counts=None, processes=None, exact=False):
+    """
+    The winner of a positional scoring rule.
 
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        score_vector (list): the score for each position, score_vector[0] is given to the first ranked alternative.
         tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        counts (dict): optional cache of position counts shared between tallies, see position_counts().
+        processes (int): if more than 1, the tally is split across a pool of this many processes.
+        exact (bool): if True the points are tallied exactly, see positional_tally().
 
     Returns:
         winner (int): the winning alternative.
     """
-    # Populates the keys (alternatives) in the points dictionary.
-    points = points_tally(preferences)
-    # Populates the values (total scores) in the points dictionary.
-    for agent in preferences:
-        preferences_list = preferences[agent]
-        for alternative in preferences_list:
-            score = len(preferences_list) - preferences_list.index(alternative) - 1
-            points[alternative] += score
+    points = positional_tally(preferences, score_vector, counts, processes, exact)
     # Finds the high score, then the alternative(s) with that score.
     high_scores_list = tie_checker(points)
     # Identifies if there is a tie, if so calls the tie_breaker function.
@@ -275,38 +1076,130 @@ def borda(preferences, tie_break):
         winner = high_scores_list[0]
     return int(winner)
 
-def harmonic(preferences, tie_break):
+def score_vectors(m):
     """
-    The winner is the alternative with the most points according to the harmonic voting rule.
+    The score vectors of the named positional voting rules.
 
-    Every agent's alternative receives a score where the alternative at position j has a score of 1/j.
+    Parameters:
+        m (int): the number of alternatives.
+
+    Returns:
+        vectors (dict): the rule names as keys and their score for each position as values.
+    """
+    return {"plurality": [1] + [0] * (m - 1),
+            "veto": [1] * (m - 1) + [0],
+            "borda": list(range(m - 1, -1, -1)),
+            "harmonic": [1/(position + 1) for position in range(m)]}
+
+def scoring_rule(preferences, score_vector, tie_break, processes=None, exact=False):
+    """
+    The winner is the alternative with the highest score.
+
+    The score_vector gives a score to each alternative in each agent's preferences.
+    For each agent, the highest score is given to the top ranked alternative and so on.
+    The score_vector must be the same number of scores as the number of alternatives, or an error is given.
+    It then sums the scores for each alternative and returns the winner.
+    A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        score_vector (list of floats): the scores to be given to the alternatives.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an error is raised.
+        processes (int): if more than 1, the tally is split across a pool of this many processes.
+        exact (bool): if True the scores are summed exactly rather than as floats, so rounding can neither make
+        nor break a tie. The scores may then be Fractions or strings such as "1/3", see positional_tally().
+
+    Returns:
+        winner (int): the winning alternative.
+        or
+        False: where the score_vector does not have the same number of scores as the number of alternatives.
+    """
+    # Checks if the score vector's length is the same as the number of alternatives.
+    if alternatives_count(preferences) == len(score_vector):
+        if exact:
+            score_vector = [Fraction(score) if isinstance(score, str) else score for score in score_vector]
+        return positional_winner(preferences, sorted(score_vector, reverse=True), tie_break, processes=processes, exact=exact)
+    else:
+        print("Incorrect input")
+        return False
+
+def plurality(preferences, tie_break, processes=None):
+    """
+    The winner is the alternative which appears the most in the first positions of agents' preferences.
+
+    Finds the alternative which is ranked first for each agent.
+    Then identifies which alternative(s) appear the most out of those.
+    A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        processes (int): if more than 1, the tally is split across a pool of this many processes.
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    return positional_winner(preferences, score_vectors(alternatives_count(preferences))["plurality"], tie_break, processes=processes)
+
+def veto(preferences, tie_break, processes=None):
+    """
+    The winner is the alternative with the most points, where every alternative apart from the last ranked one gets 1 point.
+
+    Each alternative in an agent's preferences receives 1 point, apart from each last ranked alternative.
+    The alternative with the most points is the winner. A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        processes (int): if more than 1, the tally is split across a pool of this many processes.
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    return positional_winner(preferences, score_vectors(alternatives_count(preferences))["veto"], tie_break, processes=processes)
+
+def borda(preferences, tie_break, processes=None):
+    """
+    The winner is the alternative with the most points according to the borda voting rule.
+
+    An agent's alternative at position j receives a score of m - j where m is the number of alternatives.
     The alternative with the highest score is the winner. A tie-breaking rule is used in the event of a draw.
 
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
         tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        processes (int): if more than 1, the tally is split across a pool of this many processes.
 
     Returns:
         winner (int): the winning alternative.
     """
-    # Populates the keys (alternatives) in the points dictionary.
-    points = points_tally(preferences)
-    # Populates the values (total scores) in the points dictionary.
-    for agent in preferences:
-        preferences_list = preferences[agent]
-        for alternative in preferences_list:
-            score = 1/(preferences_list.index(alternative) + 1)
-            points[alternative] += score
-    # Finds the high score, then the alternative(s) with that score.
-    high_scores_list = tie_checker(points)
-    # Identifies if there is a tie, if so calls the tie_breaker function.
-    if len(high_scores_list) > 1:
-        winner = tie_breaker(preferences, tie_break, high_scores_list)
-    else:
-        winner = high_scores_list[0]
-    return int(winner)
+    return positional_winner(preferences, score_vectors(alternatives_count(preferences))["borda"], tie_break, processes=processes)
+
+def harmonic(preferences, tie_break, processes=None, exact=False):
+    """
+    The winner is the alternative with the most points according to the harmonic voting rule.
+
+    Every agent's alternative receives a score where the alternative at position j has a score of 1/j.
+    The alternative with the highest score is the winner. A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        processes (int): if more than 1, the tally is split across a pool of this many processes.
+        exact (bool): if True the scores are exactly 1/j, scaled to whole numbers by their common denominator, rather than
+        floats, so the totals and ties are exact. This is also faster as it only counts positions.
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    m = alternatives_count(preferences)
+    if exact:
+        return positional_winner(preferences, [Fraction(1, position + 1) for position in range(m)], tie_break,
+                                 processes=processes, exact=True)
+    return positional_winner(preferences, score_vectors(m)["harmonic"], tie_break, processes=processes)
 
-def STV(preferences, tie_break):
+@instrumented("STV")
+def STV(preferences, tie_break, rounds=False):
     """
     The winner is the last alternative remaining.
 
@@ -315,72 +1208,335 @@ def STV(preferences, tie_break):
     The last remaining alternative is the winner.
     A tie-breaking rule is used in the event of a draw.
 
+    Rather than removing alternatives from every agent's list, each ballot keeps a pointer to its current first choice
+    and every alternative keeps a bucket of the ballots it currently heads. Eliminating an alternative only moves the
+    ballots in its bucket on to their next remaining choice, so the preferences passed in are never changed.
+
     Parameters:
-        preferences (dict): the preferences returned from the generate_preferences() function.
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
         tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        rounds (bool): if True the first place tallies of each round are returned as well.
 
     Returns:
         stv_winner (int): the winning alternative.
+        or
+        (stv_winner, round_tallies) (tuple): where rounds is True, round_tallies is a list with a dictionary
+        of the remaining alternatives and their first place counts for each round.
     """
-    # Populates the keys (alternatives) in the points dictionary.
-    points = points_tally(preferences)
-    # A while loop for going through the preferences dicitonary multiple times.
+    if isinstance(preferences, TruncatedProfile):
+        return truncated_STV(preferences, tie_break, rounds)
+    profile = as_profile(preferences)
+    m = profile.m
+    rankings = profile.rankings
+    # Each ballot points at the index of its current first choice in the rankings array.
+    pointers = list(range(0, profile.rows * m, m))
+    weights = profile.weights
+    buckets = {alternative: [] for alternative in range(1, m + 1)}
+    # The points of each alternative are the agents behind the ballots in its bucket.
+    bucket_points = dict.fromkeys(range(1, m + 1), 0)
+    for ballot, pointer in enumerate(pointers):
+        buckets[rankings[pointer]].append(ballot)
+        bucket_points[rankings[pointer]] += 1 if weights is None else weights[ballot]
+    remaining = list(range(1, m + 1))
+    eliminated = set()
+    round_tallies = []
     while True:
-        # This makes column_list which is the first alternative from each agent's
-        # list of alternatives in the preferences dictionary.
-        for alternative in sorted(list(preferences[1])):
-            column_list = []
-            for agents_alternatives_list in preferences.values():
-                column_list.append(agents_alternatives_list[alternative-1])
-            break
-        # The count of each alternative in the current column list is put into the points dictionary.
-        for alternative in column_list:
-            points[alternative] += 1
-        # This takes the alternative(s) with the lowest number of appearances in the agent's first place
-        # and puts them into a list called alternatives_appearances. i.e. those alternatives with the least points in the points dictionary.
-        alternatives_appearances = []
+        points = {alternative: bucket_points[alternative] for alternative in remaining}
+        round_tallies.append(points)
+        # The alternative(s) with the lowest points are eliminated, unless every remaining alternative has the lowest points.
         min_alternative_appearance = min(points.values())
-        for alternative in points:
-            if points[alternative] == min_alternative_appearance:
-                alternatives_appearances.append(alternative)
+        alternatives_appearances = [alternative for alternative in remaining if points[alternative] == min_alternative_appearance]
+        if instrumentation is not None:
+            instrumentation.count("stv_rounds")
+            instrumentation.record("stv_round", round=len(round_tallies),
+                                   eliminated=alternatives_appearances if len(alternatives_appearances) < len(remaining) else [])
+        if len(alternatives_appearances) < len(remaining):
+            if instrumentation is not None:
+                instrumentation.count("stv_eliminated", len(alternatives_appearances))
+            eliminated.update(alternatives_appearances)
+            remaining = [alternative for alternative in remaining if alternative not in eliminated]
+            # Only the ballots headed by an eliminated alternative move, on to their next remaining choice.
+            for alternative in alternatives_appearances:
+                for ballot in buckets.pop(alternative):
+                    pointer = pointers[ballot] + 1
+                    while rankings[pointer] in eliminated:
+                        pointer = pointer + 1
+                    pointers[ballot] = pointer
+                    buckets[rankings[pointer]].append(ballot)
+                    bucket_points[rankings[pointer]] += 1 if weights is None else weights[ballot]
+        # The election is over once the remaining alternatives all had the same points this round.
+        if len(set(points[alternative] for alternative in remaining)) == 1:
+            # Identifies if there is a tie, if so calls the tie_breaker function.
+            if len(remaining) > 1:
+                winner = tie_breaker(preferences, tie_break, remaining)
             else:
-                pass
-        # This removes the alternative(s) in alternatives_appearances from the preferences dictionary.
-        if len(alternatives_appearances) == len(preferences[1]):
-            pass
-        else:
+                winner = remaining[0]
+            if rounds:
+                return int(winner), round_tallies
+            return int(winner)
+
+def truncated_STV(profile, tie_break, rounds=False):
+    """
+    STV over truncated ballots, with the same rounds as STV().
+
+    A ballot whose ranked alternatives have all been eliminated is exhausted and counts for nobody from then on.
+    Each ballot keeps a pointer into the entries array and every alternative a bucket of the ballots it heads,
+    so the work is proportional to the number of ranked entries plus the remaining alternatives of each round.
+
+    Parameters:
+        profile (TruncatedProfile): the truncated ballots.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        rounds (bool): if True the first place tallies of each round are returned as well.
+
+    Returns:
+        stv_winner (int): the winning alternative.
+        or
+        (stv_winner, round_tallies) (tuple): as in STV().
+    """
+    m = profile.m
+    entries = profile.entries
+    starts = profile.starts
+    pointers = list(starts[:-1])
+    buckets = {alternative: [] for alternative in range(1, m + 1)}
+    bucket_points = dict.fromkeys(range(1, m + 1), 0)
+    for ballot, pointer in enumerate(pointers):
+        if pointer < starts[ballot + 1]:
+            buckets[entries[pointer]].append(ballot)
+            bucket_points[entries[pointer]] += 1
+    remaining = list(range(1, m + 1))
+    eliminated = set()
+    round_tallies = []
+    while True:
+        points = {alternative: bucket_points[alternative] for alternative in remaining}
+        round_tallies.append(points)
+        # The alternative(s) with the lowest points are eliminated, unless every remaining alternative has the lowest points.
+        min_alternative_appearance = min(points.values())
+        alternatives_appearances = [alternative for alternative in remaining if points[alternative] == min_alternative_appearance]
+        if instrumentation is not None:
+            instrumentation.count("stv_rounds")
+            instrumentation.record("stv_round", round=len(round_tallies),
+                                   eliminated=alternatives_appearances if len(alternatives_appearances) < len(remaining) else [])
+        if len(alternatives_appearances) < len(remaining):
+            if instrumentation is not None:
+                instrumentation.count("stv_eliminated", len(alternatives_appearances))
+            eliminated.update(alternatives_appearances)
+            remaining = [alternative for alternative in remaining if alternative not in eliminated]
+            # The ballots headed by an eliminated alternative move on to their next remaining choice, or are exhausted.
             for alternative in alternatives_appearances:
-                for agents_alternatives_list in preferences.values():
-                    for original_alternative in agents_alternatives_list:
-                        if original_alternative == alternative:
-                            agents_alternatives_list.remove(alternative)
-                        else:
-                            pass
-                # Removes those alternatives from the points dictionary as well.
-                points.pop(alternative)
-        # This piece of code checks how many points the remaining alternatives have in the points dictionary.
-        # It is then converted to a set to remove duplicates. This code prevents the situation where all
-        # alternatives may be removed in the event of the last remaining alternatives all having the lowest points.
-        stv_alternative_list = []
-        for stv_alternative in points.values():
-            stv_alternative_list.append(stv_alternative)
-        stv_alternative_set = set(stv_alternative_list)
-        # Finds the high score, then the alternative(s) with that score.
-        high_scores_list = tie_checker(points)
-        # This asks if there is only one element in the set. If there is then the while loop can now finish.
-        if len(stv_alternative_set) == 1:
+                for ballot in buckets.pop(alternative):
+                    pointer = pointers[ballot] + 1
+                    end = starts[ballot + 1]
+                    while pointer < end and entries[pointer] in eliminated:
+                        pointer = pointer + 1
+                    pointers[ballot] = pointer
+                    if pointer < end:
+                        buckets[entries[pointer]].append(ballot)
+                        bucket_points[entries[pointer]] += 1
+        # The election is over once the remaining alternatives all had the same points this round.
+        if len(set(points[alternative] for alternative in remaining)) == 1:
             # Identifies if there is a tie, if so calls the tie_breaker function.
-            if len(high_scores_list) > 1:
-                winner = tie_breaker(preferences, tie_break, high_scores_list)
-            elif len(high_scores_list) == 1:
-                winner = preferences[1][0]
+            if len(remaining) > 1:
+                winner = tie_breaker(profile, tie_break, remaining)
+            else:
+                winner = remaining[0]
+            if rounds:
+                return int(winner), round_tallies
             return int(winner)
-        else:
-            # Clears the dictionary values after each loop of the while loop.
-            points = points.fromkeys(points, 0)
-            continue
 
-def range_voting(values, tie_break):
+# The header of a profile file: the magic bytes, format version, flags, rankings typecode and item size,
+# n, m and the CRC-32 checksum of everything after the header. It is followed by the rankings, the positions,
+# then (aligned to 8 bytes) the valuations and the range totals as doubles and the agent labels as 64-bit integers
+# if the flags say they are present.
+PROFILE_MAGIC = b"VPRF"
+PROFILE_VERSION = 1
+PROFILE_HEADER = struct.Struct("<4sBBcBQQI4x")
+PROFILE_VALUATIONS = 1
+PROFILE_RANGE_TOTALS = 2
+PROFILE_BIG_ENDIAN = 4
+PROFILE_AGENTS = 8
+
+def write_profile_header(file, flags, typecode, n, m):
+    """
+    Writes the header of a profile file, with the checksum of the data already written after it.
+
+    Parameters:
+        file (file): the profile file opened for reading and writing in binary mode.
+        flags (int): any of PROFILE_VALUATIONS, PROFILE_RANGE_TOTALS and PROFILE_AGENTS.
+        typecode (str): the typecode of the rankings and positions.
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+    """
+    if sys.byteorder == "big":
+        flags = flags | PROFILE_BIG_ENDIAN
+    checksum = 0
+    file.seek(PROFILE_HEADER.size)
+    for block in iter(lambda: file.read(1 << 20), b""):
+        checksum = zlib.crc32(block, checksum)
+    file.seek(0)
+    file.write(PROFILE_HEADER.pack(PROFILE_MAGIC, PROFILE_VERSION, flags, typecode.encode(),
+                                   array(typecode).itemsize, n, m, checksum))
+
+def pad_to_eight(file):
+    """
+    Pads a file with zero bytes so the next section starts at a multiple of 8 bytes.
+
+    Parameters:
+        file (file): the file opened for writing in binary mode.
+    """
+    file.write(bytes(-file.tell() % 8))
+
+def save_profile(profile, filename):
+    """
+    Saves a PreferenceProfile in the binary profile format read by load_profile().
+
+    Parameters:
+        profile (PreferenceProfile): the profile, its valuations, range totals and agent labels are saved too if it has them.
+        Agent labels must be integers.
+        filename (str): the path of the profile file.
+    """
+    if profile.weights is not None:
+        raise ValueError("An AnonymousProfile cannot be saved as a profile file.")
+    if profile.agents is not None:
+        if not all(type(agent) is int for agent in profile.agents):
+            raise ValueError("Only integer agent labels can be saved in a profile file.")
+        # Raises an OverflowError for labels which do not fit in 64 bits.
+        agents = array("q", profile.agents)
+    flags = 0
+    with open(filename, "w+b") as file:
+        file.write(bytes(PROFILE_HEADER.size))
+        file.write(memoryview(profile.rankings).cast("B"))
+        file.write(memoryview(profile.positions).cast("B"))
+        pad_to_eight(file)
+        if profile.valuations is not None:
+            flags = flags | PROFILE_VALUATIONS
+            file.write(memoryview(profile.valuations).cast("B"))
+        if profile.range_totals is not None:
+            flags = flags | PROFILE_RANGE_TOTALS
+            array("d", profile.range_totals.values()).tofile(file)
+        if profile.agents is not None:
+            flags = flags | PROFILE_AGENTS
+            agents.tofile(file)
+        typecode = profile.rankings.format if isinstance(profile.rankings, memoryview) else profile.rankings.typecode
+        write_profile_header(file, flags, typecode, profile.n, profile.m)
+
+def convert_workbook(values, filename, chunk_size=4096, valuations=True):
+    """
+    Converts a worksheet into the binary profile format, reading it once in chunks.
+
+    Only one chunk of rows is held in memory at a time. The positions and valuations are
+    written to temporary files as the chunks are read, then copied in after the rankings.
+
+    Parameters:
+        values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file.
+        filename (str): the path of the profile file.
+        chunk_size (int): the number of rows read at a time.
+        valuations (bool): if True the raw values and their range totals are stored as well.
+
+    Returns:
+        n (int): the number of agents written.
+    """
+    n = 0
+    m = None
+    with open(filename, "w+b") as file, tempfile.TemporaryFile() as positions_file, tempfile.TemporaryFile() as valuations_file:
+        file.write(bytes(PROFILE_HEADER.size))
+        for chunk in worksheet_chunks(values, chunk_size):
+            if m is None:
+                m = len(chunk[0])
+                typecode = smallest_typecode(m)
+                range_totals = [0] * m
+            rankings = array(typecode)
+            rank_valuations(chunk, rankings)
+            rankings.tofile(file)
+            invert_rankings(rankings, m).tofile(positions_file)
+            if valuations:
+                array("d", [valuation for row in chunk for valuation in row]).tofile(valuations_file)
+                for index, column in enumerate(zip(*chunk)):
+                    range_totals[index] = reduce(add, column, range_totals[index])
+            n = n + len(chunk)
+        if m is None:
+            raise ValueError("The worksheet has no agents.")
+        # Copies the positions and the valuations in after the rankings.
+        positions_file.seek(0)
+        shutil.copyfileobj(positions_file, file)
+        pad_to_eight(file)
+        flags = 0
+        if valuations:
+            flags = PROFILE_VALUATIONS | PROFILE_RANGE_TOTALS
+            valuations_file.seek(0)
+            shutil.copyfileobj(valuations_file, file)
+            array("d", range_totals).tofile(file)
+        write_profile_header(file, flags, typecode, n, m)
+    return n
+
+def load_profile(filename, verify=False):
+    """
+    Opens a profile file as a PreferenceProfile backed by a read-only memory map of the file.
+
+    Nothing is copied into memory, the rankings, positions and valuations are views of the mapped file
+    which the operating system pages in as the voting rules read them. Profiles bigger than the
+    available memory can be tallied and the page cache is shared between processes reading the same file.
+
+    Parameters:
+        filename (str): the path of a profile file written by save_profile() or convert_workbook().
+        verify (bool): if True the checksum of the whole file is checked, which reads all of it.
+
+    Returns:
+        profile (PreferenceProfile): the profile, with valuations, range_totals and agent labels if the file has them.
+    """
+    with open(filename, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, flags, typecode, itemsize, n, m, checksum = PROFILE_HEADER.unpack_from(mapping)
+    typecode = typecode.decode()
+    if magic != PROFILE_MAGIC or version != PROFILE_VERSION:
+        raise ValueError(f"{filename} is not a version {PROFILE_VERSION} profile file.")
+    if array(typecode).itemsize != itemsize or bool(flags & PROFILE_BIG_ENDIAN) != (sys.byteorder == "big"):
+        raise ValueError(f"{filename} was written on a platform with a different integer layout.")
+    data = memoryview(mapping)
+    if verify:
+        calculated = 0
+        for start in range(PROFILE_HEADER.size, len(data), 1 << 24):
+            calculated = zlib.crc32(data[start:start + (1 << 24)], calculated)
+        if calculated != checksum:
+            raise ValueError(f"The checksum of {filename} does not match, the file is corrupt.")
+    matrix_size = n * m * itemsize
+    start = PROFILE_HEADER.size
+    rankings = data[start:start + matrix_size].cast(typecode)
+    positions = data[start + matrix_size:start + 2 * matrix_size].cast(typecode)
+    start = start + 2 * matrix_size
+    start = start + (-start % 8)
+    valuations = None
+    range_totals = None
+    agents = None
+    if flags & PROFILE_VALUATIONS:
+        valuations = data[start:start + n * m * 8].cast("d")
+        start = start + n * m * 8
+    if flags & PROFILE_RANGE_TOTALS:
+        range_totals = data[start:start + m * 8].cast("d")
+        range_totals = {alternative: total for alternative, total in enumerate(range_totals.tolist(), 1)}
+        start = start + m * 8
+    if flags & PROFILE_AGENTS:
+        agents = data[start:start + n * 8].cast("q").tolist()
+    profile = PreferenceProfile(rankings, m, agents, positions=positions)
+    profile.filename = filename
+    profile.valuations = valuations
+    profile.range_totals = range_totals
+    return profile
+
+def valuation_totals(profile, alternatives):
+    """
+    Sums the valuations of some alternatives one agent at a time, in agent order.
+
+    Parameters:
+        profile (PreferenceProfile): a profile with its valuations.
+        alternatives (iterable): the alternatives to sum.
+
+    Returns:
+        totals (dict): the alternatives as keys and the sum of their values as values.
+    """
+    return {alternative: reduce(add, profile.valuations[alternative - 1::profile.m], 0) for alternative in alternatives}
+
+@instrumented("range_voting")
+def range_voting(values, tie_break, chunk_size=4096, processes=None):
     """
     The winner is the alternative with the largest sum of values.
 
@@ -388,34 +1544,241 @@ def range_voting(values, tie_break):
     are summed, the winner is the alternative with the largest sum of values.
     A tie-breaking rule is used in the event of a draw.
 
+    The worksheet is read once in chunks of rows, only the running totals are kept.
+
     Parameters:
-        values (openpyxl worksheet): the numerical values each agent assigns to the alternatives
-        (a higher value means an alternative is more preferred).
+        values (openpyxl worksheet, str or PreferenceProfile): the numerical values each agent assigns to the alternatives
+        (a higher value means an alternative is more preferred). Either the worksheet, the path of an .xlsx file
+        or a profile from stream_preferences() which already holds the totals.
         tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        chunk_size (int): the number of rows read at a time.
+        processes (int): if more than 1 and the profile has its valuations but no totals, the columns are summed
+        across a pool of this many processes.
 
     Returns:
         winner (int): the winning alternative.
     """
-    preferences = generate_preferences(values)
-    # Finds the row length to help construct the points dictionary.
-    for values_row in values.iter_rows(values_only=True):
-        row_length = len(list(values_row))
+    if isinstance(values, PreferenceProfile):
+        if values.range_totals is not None:
+            points = dict(values.range_totals)
+        elif values.valuations is not None and processes is not None and processes > 1:
+            points = parallel_range_totals(values, processes)
+        elif values.valuations is not None:
+            points = valuation_totals(values, range(1, values.m + 1))
+        else:
+            raise ValueError("The profile was not read with its values, see stream_preferences().")
+        preferences = values
+    else:
+        # Reads the worksheet once, summing each alternative's values. Only the tie-breaking agent's row is kept,
+        # it is ranked if a tie needs breaking.
+        points = None
+        tie_break_row = None
+        agent = 0
+        for chunk in worksheet_chunks(values, chunk_size):
+            if points is None:
+                points = dict.fromkeys(range(1, len(chunk[0]) + 1), 0)
+            if isinstance(tie_break, int) and agent < tie_break <= agent + len(chunk):
+                tie_break_row = chunk[tie_break - agent - 1]
+            agent = agent + len(chunk)
+            for alternative, column in enumerate(zip(*chunk), 1):
+                points[alternative] = reduce(add, column, points[alternative])
+        preferences = {}
+        if tie_break_row is not None:
+            preferences[tie_break] = valuations_to_preferences(tie_break_row)
+    # Finds the high score, then the alternative(s) with that score.
+    high_scores_list = tie_checker(points)
+    # Identifies if there is a tie, if so calls the tie_breaker function.
+    if len(high_scores_list) > 1:
+        winner = tie_breaker(preferences, tie_break, high_scores_list)
+    else:
+        winner = high_scores_list[0]
+    return int(winner)
+
+def evaluate_all(profile, rules=None, tie_break="min"):
+    """
+    Finds the winner of several voting rules on the same election, sharing the work between them.
+
+    The position counts (the first place counts, the last place counts and the other columns of the rankings)
+    are each counted once and shared by plurality, veto and borda, the STV rounds start from the same profile,
+    range voting uses the range totals collected while the worksheet was read and copeland, maximin and schulze
+    share one pairwise matrix.
+    Each rule's winner is the same as calling the rule on its own.
+
+    Parameters:
+        profile (dict/PreferenceProfile, openpyxl worksheet or str): the preferences, or a worksheet or .xlsx path
+        which is read once with stream_preferences().
+        rules (list): the names of the rules, any of "plurality", "veto", "borda", "harmonic", "STV", "range_voting",
+        "copeland", "maximin" and "schulze". By default plurality, veto, borda, harmonic and STV, with range_voting
+        as well where the profile has its values (a profile from a dict of rankings does not).
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        winners (dict): the rule names as keys and their winning alternative as values.
+    """
+    # The ballots are put in a profile once, every rule below shares it.
+    if isinstance(profile, (dict, PreferenceProfile)):
+        profile = as_profile(profile)
+    else:
+        profile = stream_preferences(profile)
+    if rules is None:
+        rules = ("plurality", "veto", "borda", "harmonic", "STV")
+        if profile.range_totals is not None or profile.valuations is not None:
+            rules = rules + ("range_voting",)
+    vectors = score_vectors(profile.m)
+    pairwise_rules = {"copeland": copeland, "maximin": maximin, "schulze": schulze}
+    counts = {}
+    matrix = None
+    winners = {}
+    for rule in rules:
+        if rule in vectors:
+            winners[rule] = positional_winner(profile, vectors[rule], tie_break, counts)
+        elif rule == "STV":
+            winners[rule] = STV(profile, tie_break)
+        elif rule == "range_voting":
+            winners[rule] = range_voting(profile, tie_break)
+        elif rule in pairwise_rules:
+            if matrix is None:
+                matrix = pairwise_matrix(profile)
+            winners[rule] = pairwise_rules[rule](profile, tie_break, matrix)
+        else:
+            raise ValueError(f"{rule} is not a voting rule evaluate_all() knows.")
+    return winners
+
+@instrumented("pairwise_matrix")
+def pairwise_matrix(preferences, chunk_size=65536):
+    """
+    Counts, for every pair of alternatives, how many agents rank one above the other.
+
+    The counts are made from the positions array, one block of agents at a time so only
+    m columns of chunk_size positions are held at once. For each pair of alternatives the comparison
+    of their two position columns runs in C, so the whole matrix takes m * (m - 1) / 2 passes over each block.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        chunk_size (int): the number of agents compared at a time.
+
+    Returns:
+        matrix (dict): matrix[a][b] is the number of agents who rank alternative a above alternative b.
+    """
+    profile = as_profile(preferences)
+    m = profile.m
+    matrix = {a: dict.fromkeys(range(1, m + 1), 0) for a in range(1, m + 1)}
+    for chunk_start in range(0, profile.rows, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, profile.rows)
+        columns = [profile.positions[chunk_start * m + a - 1:chunk_end * m:m] for a in range(1, m + 1)]
+        if profile.weights is None:
+            chunk_agents = chunk_end - chunk_start
+        else:
+            chunk_weights = profile.weights[chunk_start:chunk_end]
+            chunk_agents = sum(chunk_weights)
+        for a in range(1, m + 1):
+            for b in range(a + 1, m + 1):
+                if profile.weights is None:
+                    a_above_b = sum(map(lt, columns[a - 1], columns[b - 1]))
+                else:
+                    a_above_b = sum(compress(chunk_weights, map(lt, columns[a - 1], columns[b - 1])))
+                matrix[a][b] += a_above_b
+                matrix[b][a] += chunk_agents - a_above_b
+    return matrix
+
+def condorcet_winner(preferences, matrix=None):
+    """
+    The winner is the alternative which a majority of agents prefer to every other alternative.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        matrix (dict): optional pairwise matrix already made by pairwise_matrix().
+
+    Returns:
+        winner (int): the Condorcet winner.
+        or
+        None: where there is no Condorcet winner.
+    """
+    if matrix is None:
+        matrix = pairwise_matrix(preferences)
+    for a in matrix:
+        if all(matrix[a][b] > matrix[b][a] for b in matrix if b != a):
+            return int(a)
+    return None
+
+def copeland_points(matrix):
+    """
+    The Copeland score of every alternative, 1 point per pairwise win and half a point per draw.
+
+    Parameters:
+        matrix (dict): the pairwise matrix made by pairwise_matrix().
+
+    Returns:
+        points (dict): a dictionary where alternatives are the keys and the points are the values.
+    """
     points = {}
-    # Populates the keys (alternatives) in the points dictionary.
-    alternative_key = 1
-    while alternative_key <= row_length:
-        points[alternative_key] = []
-        alternative_key = alternative_key + 1
-    # This arranges the values by alternatives in the points dictionary.
-    # e.g. Alternative 1: [Agent 1's 1st preference... Agent n's first preference]
-    for values_row in values.iter_rows(values_only=True):
-        loop_iterator = 0
-        while loop_iterator < row_length:
-            points[loop_iterator + 1].append(values_row[loop_iterator])
-            loop_iterator = loop_iterator + 1
-    # Sums the totals for each alternative in the points dictionary.
-    for alternative in points:
-        points[alternative] = sum(points[alternative])
+    for a in matrix:
+        points[a] = 0
+        for b in matrix:
+            if b != a and matrix[a][b] > matrix[b][a]:
+                points[a] += 1
+            elif b != a and matrix[a][b] == matrix[b][a]:
+                points[a] += 0.5
+    return points
+
+def copeland(preferences, tie_break, matrix=None):
+    """
+    The winner is the alternative which wins the most pairwise majority contests.
+
+    Each alternative gets 1 point for every other alternative a majority of agents prefer it to,
+    and half a point for every other alternative it draws with.
+    A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        matrix (dict): optional pairwise matrix already made by pairwise_matrix().
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    if matrix is None:
+        matrix = pairwise_matrix(preferences)
+    points = copeland_points(matrix)
+    # Finds the high score, then the alternative(s) with that score.
+    high_scores_list = tie_checker(points)
+    # Identifies if there is a tie, if so calls the tie_breaker function.
+    if len(high_scores_list) > 1:
+        winner = tie_breaker(preferences, tie_break, high_scores_list)
+    else:
+        winner = high_scores_list[0]
+    return int(winner)
+
+def maximin_points(matrix):
+    """
+    The Maximin score of every alternative, the fewest agents preferring it to any one other alternative.
+
+    Parameters:
+        matrix (dict): the pairwise matrix made by pairwise_matrix().
+
+    Returns:
+        points (dict): a dictionary where alternatives are the keys and the points are the values.
+    """
+    return {a: min((matrix[a][b] for b in matrix if b != a), default=0) for a in matrix}
+
+def maximin(preferences, tie_break, matrix=None):
+    """
+    The winner is the alternative whose worst pairwise contest is the best.
+
+    Each alternative's score is the smallest number of agents preferring it to any one other alternative.
+    The alternative with the highest score is the winner. A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        matrix (dict): optional pairwise matrix already made by pairwise_matrix().
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    if matrix is None:
+        matrix = pairwise_matrix(preferences)
+    points = maximin_points(matrix)
     # Finds the high score, then the alternative(s) with that score.
     high_scores_list = tie_checker(points)
     # Identifies if there is a tie, if so calls the tie_breaker function.
@@ -424,3 +1787,1670 @@ def range_voting(values, tie_break):
     else:
         winner = high_scores_list[0]
     return int(winner)
+
+def schulze_strengths(matrix):
+    """
+    The strength of the widest path between every pair of alternatives, found with the Floyd-Warshall algorithm.
+
+    Parameters:
+        matrix (dict): the pairwise matrix made by pairwise_matrix().
+
+    Returns:
+        strength (dict): strength[a][b] is the strength of the widest path from alternative a to alternative b.
+    """
+    alternatives = list(matrix)
+    strength = {a: {b: matrix[a][b] if matrix[a][b] > matrix[b][a] else 0 for b in alternatives} for a in alternatives}
+    for k in alternatives:
+        for a in alternatives:
+            if a == k:
+                continue
+            a_to_k = strength[a][k]
+            if a_to_k == 0:
+                continue
+            for b in alternatives:
+                if b != a and b != k:
+                    through_k = min(a_to_k, strength[k][b])
+                    if through_k > strength[a][b]:
+                        strength[a][b] = through_k
+    return strength
+
+def schulze(preferences, tie_break, matrix=None):
+    """
+    The winner is the alternative with the strongest beatpaths to every other alternative.
+
+    A pairwise contest a over b has strength matrix[a][b] if a majority prefers a to b, otherwise 0.
+    The strength of a path is its weakest contest and the widest path between every pair is found
+    in O(m^3) with the Floyd-Warshall algorithm. An alternative wins if its widest path to every other alternative
+    is at least as strong as the widest path back. A tie-breaking rule is used in the event of a draw.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        matrix (dict): optional pairwise matrix already made by pairwise_matrix().
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    if matrix is None:
+        matrix = pairwise_matrix(preferences)
+    alternatives = list(matrix)
+    strength = schulze_strengths(matrix)
+    high_scores_list = [a for a in alternatives if all(strength[a][b] >= strength[b][a] for b in alternatives if b != a)]
+    # Identifies if there is a tie, if so calls the tie_breaker function.
+    if len(high_scores_list) > 1:
+        winner = tie_breaker(preferences, tie_break, high_scores_list)
+    else:
+        winner = high_scores_list[0]
+    return int(winner)
+
+# The profile each worker process of a parallel tally reads from, attached once by attach_profile().
+worker_profile = None
+
+def share_profile(profile):
+    """
+    Makes a profile readable by other processes without pickling its ballots.
+
+    A profile loaded from a profile file is simply reopened by each process, the memory maps share the
+    operating system's page cache. Otherwise the rankings, positions and valuations are copied once into
+    a block of shared memory which the processes attach to.
+
+    Parameters:
+        profile (PreferenceProfile): the profile.
+
+    Returns:
+        (source, shared_memory) (tuple): the description attach_profile() needs, and the SharedMemory block
+        to close and unlink when the processes are done, or None where the profile file is used.
+    """
+    if profile.filename is not None:
+        return ("file", profile.filename), None
+    rankings = memoryview(profile.rankings).cast("B")
+    positions = memoryview(profile.positions).cast("B")
+    sections = [rankings, positions]
+    if profile.valuations is not None:
+        sections.append(memoryview(profile.valuations).cast("B"))
+    size = len(rankings) * 2
+    size = size + (-size % 8)
+    shared_memory = SharedMemory(create=True, size=max(size + sum(len(section) for section in sections[2:]), 1))
+    shared_memory.buf[:len(rankings)] = rankings
+    shared_memory.buf[len(rankings):2 * len(rankings)] = positions
+    if profile.valuations is not None:
+        shared_memory.buf[size:size + len(sections[2])] = sections[2]
+    typecode = profile.rankings.format if isinstance(profile.rankings, memoryview) else profile.rankings.typecode
+    source = ("shared_memory", shared_memory.name, typecode, profile.n, profile.m, profile.valuations is not None)
+    return source, shared_memory
+
+def attach_profile(source):
+    """
+    Attaches a worker process to a profile shared with share_profile(), used as the process pool initializer.
+
+    Parameters:
+        source (tuple): the description returned by share_profile().
+    """
+    global worker_profile
+    if source[0] == "file":
+        worker_profile = load_profile(source[1])
+        return
+    kind, name, typecode, n, m, has_valuations = source
+    shared_memory = SharedMemory(name=name)
+    data = shared_memory.buf
+    matrix_size = n * m * array(typecode).itemsize
+    worker_profile = PreferenceProfile(data[:matrix_size].cast(typecode), m,
+                                       positions=data[matrix_size:2 * matrix_size].cast(typecode))
+    if has_valuations:
+        start = 2 * matrix_size + (-2 * matrix_size % 8)
+        worker_profile.valuations = data[start:start + n * m * 8].cast("d")
+    # Keeps the block open for as long as the worker uses it.
+    worker_profile.shared_memory = shared_memory
+
+def shard_position_counts(start, stop, positions):
+    """
+    Counts the alternatives at some positions for the agents start to stop - 1 of the worker's profile.
+
+    Parameters:
+        start (int): the first agent row of the shard.
+        stop (int): the row after the last agent of the shard.
+        positions (list): the positions to count.
+
+    Returns:
+        counts (dict): the positions as keys and Counters of the alternatives ranked there as values.
+    """
+    m = worker_profile.m
+    return {position: Counter(worker_profile.rankings[start * m + position:stop * m:m]) for position in positions}
+
+def shard_alternative_points(score_vector, alternatives):
+    """
+    Adds up the points of some alternatives in the worker's profile, see alternative_points().
+
+    Parameters:
+        score_vector (list): the score for each position.
+        alternatives (range): the alternatives of the shard.
+
+    Returns:
+        points (dict): the alternatives as keys and their points as values.
+    """
+    return alternative_points(worker_profile, score_vector, alternatives)
+
+def shard_valuation_totals(alternatives):
+    """
+    Sums the valuations of some alternatives in the worker's profile, see valuation_totals().
+
+    Parameters:
+        alternatives (range): the alternatives of the shard.
+
+    Returns:
+        totals (dict): the alternatives as keys and the sum of their values as values.
+    """
+    return valuation_totals(worker_profile, alternatives)
+
+def split_range(length, parts):
+    """
+    Splits range(length) into at most parts contiguous ranges of nearly equal size.
+
+    Parameters:
+        length (int): the length of the range.
+        parts (int): the number of ranges wanted.
+
+    Returns:
+        ranges (list): the (start, stop) pairs.
+    """
+    parts = max(1, min(parts, length))
+    return [(length * part // parts, length * (part + 1) // parts) for part in range(parts)]
+
+def run_on_shards(profile, processes, function, shard_arguments):
+    """
+    Runs a function over shards of a shared profile in a process pool.
+
+    Parameters:
+        profile (PreferenceProfile): the profile, shared with the workers by share_profile().
+        processes (int): the number of worker processes.
+        function (function): the shard function, a module level function reading worker_profile.
+        shard_arguments (list): the tuple of arguments for each shard.
+
+    Returns:
+        results (list): the result of each shard, in shard order.
+    """
+    source, shared_memory = share_profile(profile)
+    try:
+        with ProcessPoolExecutor(processes, initializer=attach_profile, initargs=(source,)) as pool:
+            return list(pool.map(function, *zip(*shard_arguments)))
+    finally:
+        if shared_memory is not None:
+            shared_memory.close()
+            shared_memory.unlink()
+
+def parallel_tally(profile, score_vector, processes, counts=None):
+    """
+    Tallies a positional scoring rule across a pool of processes, giving exactly the same points as positional_tally().
+
+    When every score is a whole number the agents are split into one shard per process. Each worker counts
+    the alternatives at the positions that need counting for its agents, and the counts are merged and
+    used by positional_tally() as if they had been counted in one go, which is exact.
+    Otherwise the alternatives are split instead, so every alternative's floating point points are still
+    added up in agent order by one worker, and are bit for bit the same as the serial tally.
+    The ballots are never pickled, the workers read them from shared memory or the memory-mapped profile file.
+
+    Parameters:
+        profile (PreferenceProfile): the preferences.
+        score_vector (list): the score for each position, score_vector[0] is given to the first ranked alternative.
+        processes (int): the number of worker processes.
+        counts (dict): optional cache of position counts shared between tallies, see position_counts().
+
+    Returns:
+        points (dict): a dictionary where alternatives are the keys and the points are the values.
+    """
+    if counts is None:
+        counts = {}
+    if is_integral(score_vector):
+        base_score = Counter(score_vector).most_common(1)[0][0]
+        positions = [position for position, score in enumerate(score_vector) if score != base_score and position not in counts]
+        if positions:
+            shards = [(start, stop, positions) for start, stop in split_range(profile.n, processes)]
+            merged = {position: Counter() for position in positions}
+            for shard_counts in run_on_shards(profile, processes, shard_position_counts, shards):
+                for position in positions:
+                    merged[position].update(shard_counts[position])
+            counts.update(merged)
+        return positional_tally(profile, score_vector, counts)
+    points = {}
+    shards = [(score_vector, range(start + 1, stop + 1)) for start, stop in split_range(profile.m, processes)]
+    for shard_points in run_on_shards(profile, processes, shard_alternative_points, shards):
+        points.update(shard_points)
+    return points
+
+def parallel_range_totals(profile, processes):
+    """
+    Sums each alternative's valuations across a pool of processes, one shard of alternatives per process.
+
+    Every alternative is still summed in agent order by one worker, so the totals are the same as valuation_totals().
+
+    Parameters:
+        profile (PreferenceProfile): a profile with its valuations.
+        processes (int): the number of worker processes.
+
+    Returns:
+        totals (dict): the alternatives as keys and the sum of their values as values.
+    """
+    totals = {}
+    shards = [(range(start + 1, stop + 1),) for start, stop in split_range(profile.m, processes)]
+    for shard_totals in run_on_shards(profile, processes, shard_valuation_totals, shards):
+        totals.update(shard_totals)
+    return totals
+
+def integer_score_vector(score_vector):
+    """
+    Scales a score vector of whole numbers, fractions or floats to whole numbers with a common denominator.
+
+    Every float is a rational number, so the scaled scores are exact and any tally made with them has exact ties.
+
+    Parameters:
+        score_vector (list): the score for each position.
+
+    Returns:
+        (scores, denominator) (tuple): the scaled whole number scores and the denominator they were multiplied by.
+    """
+    fractions = [Fraction(score) for score in score_vector]
+    denominator = lcm(*(fraction.denominator for fraction in fractions))
+    return [int(fraction * denominator) for fraction in fractions], denominator
+
+class Election:
+    """
+    A live election which keeps running totals as ballots arrive, change or are withdrawn.
+
+    The points of every alternative are kept for plurality, veto, borda, harmonic and any extra score vectors,
+    along with the range voting sums, so adding, removing or updating a ballot costs O(m) and so does finding a winner.
+    The totals are kept exactly: harmonic uses the scores 1/j scaled by a common denominator, other fractional
+    score vectors are scaled the same way and the range voting sums are fractions, so removing a ballot
+    takes off exactly what adding it put on.
+
+    Parameters:
+        m (int): the number of alternatives.
+        vectors (dict): optional extra score vectors, the rule names as keys and the scores as values. As in
+        scoring_rule() the highest score is given to the top ranked alternative.
+
+    Attributes:
+        preferences (dict): the ranking of every agent who has voted, like the dictionary from generate_preferences().
+        valuations (dict): the values of every agent who voted with values rather than a ranking.
+        totals (dict): the rule names as keys and dictionaries of each alternative's (scaled) points as values.
+        range_totals (dict): the sum of each alternative's values.
+    """
+    def __init__(self, m, vectors=None):
+        self.m = m
+        self.preferences = {}
+        self.valuations = {}
+        self.vectors = {}
+        for rule, score_vector in score_vectors(m).items():
+            self.vectors[rule] = integer_score_vector(score_vector if rule != "harmonic" else
+                                                      [Fraction(1, position + 1) for position in range(m)])[0]
+        for rule, score_vector in (vectors or {}).items():
+            if len(score_vector) != m:
+                raise ValueError(f"The score vector of {rule} must have one score per alternative.")
+            self.vectors[rule] = integer_score_vector(sorted(score_vector, reverse=True))[0]
+        self.totals = {rule: dict.fromkeys(range(1, m + 1), 0) for rule in self.vectors}
+        self.range_totals = dict.fromkeys(range(1, m + 1), Fraction(0))
+
+    def tally(self, agent, sign):
+        """
+        Adds (sign 1) or takes away (sign -1) an agent's ballot from the running totals.
+
+        Parameters:
+            agent (int): the agent.
+            sign (int): 1 or -1.
+        """
+        for rule, scores in self.vectors.items():
+            points = self.totals[rule]
+            for alternative, score in zip(self.preferences[agent], scores):
+                points[alternative] += sign * score
+        if agent in self.valuations:
+            for alternative, valuation in enumerate(self.valuations[agent], 1):
+                self.range_totals[alternative] += sign * Fraction(valuation)
+
+    def add_ballot(self, agent, ranking=None, valuations=None):
+        """
+        Adds a new agent's ballot, either a ranking or a row of values like a worksheet row.
+
+        Parameters:
+            agent (int): the agent, who must not have voted already.
+            ranking (list): the alternatives from most to least preferred.
+            valuations (list): the values the agent assigns to the alternatives, the ranking is made from them.
+        """
+        if agent in self.preferences:
+            raise ValueError(f"Agent {agent} has already voted, use update_ballot().")
+        if valuations is not None:
+            if len(valuations) != self.m:
+                raise ValueError("A ballot must give a value to every alternative.")
+            ranking = valuations_to_preferences(valuations)
+            self.valuations[agent] = list(valuations)
+        elif ranking is None or sorted(ranking) != list(range(1, self.m + 1)):
+            raise ValueError("A ballot must rank every alternative exactly once.")
+        self.preferences[agent] = list(ranking)
+        self.tally(agent, 1)
+
+    def remove_ballot(self, agent):
+        """
+        Withdraws an agent's ballot.
+
+        Parameters:
+            agent (int): the agent. A KeyError is raised if they have not voted.
+        """
+        self.tally(agent, -1)
+        del self.preferences[agent]
+        self.valuations.pop(agent, None)
+
+    def update_ballot(self, agent, ranking=None, valuations=None):
+        """
+        Replaces an agent's ballot with a new ranking or row of values.
+
+        Parameters:
+            agent (int): the agent. A KeyError is raised if they have not voted.
+            ranking (list): the alternatives from most to least preferred.
+            valuations (list): the values the agent assigns to the alternatives.
+        """
+        previous_ranking = self.preferences[agent]
+        previous_valuations = self.valuations.get(agent)
+        self.remove_ballot(agent)
+        try:
+            self.add_ballot(agent, ranking, valuations)
+        except ValueError:
+            self.add_ballot(agent, previous_ranking, previous_valuations)
+            raise
+
+    def winner(self, rule, tie_break):
+        """
+        The current winner of a rule, found from the running totals.
+
+        Parameters:
+            rule (str): "plurality", "veto", "borda", "harmonic", "range_voting", the name of an extra score vector,
+            or "STV" which is run on the current preferences rather than from running totals.
+            tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+        Returns:
+            winner (int): the winning alternative.
+        """
+        if rule == "STV":
+            return STV(self.preferences, tie_break)
+        if rule == "range_voting":
+            points = self.range_totals
+        else:
+            points = self.totals[rule]
+        # Finds the high score, then the alternative(s) with that score.
+        high_scores_list = tie_checker(points)
+        # Identifies if there is a tie, if so calls the tie_breaker function.
+        if len(high_scores_list) > 1:
+            winner = tie_breaker(self.preferences, tie_break, high_scores_list)
+        else:
+            winner = high_scores_list[0]
+        return int(winner)
+
+def impartial_culture(n, m, seed=None):
+    """
+    Generates a profile where every agent's ranking is drawn uniformly at random.
+
+    Parameters:
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+        seed (int): the seed of the random number generator, the same seed gives the same profile.
+
+    Returns:
+        profile (PreferenceProfile): the generated preferences.
+    """
+    generator = random.Random(seed)
+    rankings = array(smallest_typecode(m))
+    alternatives = list(range(1, m + 1))
+    for agent in range(n):
+        generator.shuffle(alternatives)
+        rankings.extend(alternatives)
+    return PreferenceProfile(rankings, m)
+
+def mallows(n, m, dispersion, seed=None, reference=None):
+    """
+    Generates a profile from the Mallows model, where rankings close to a reference ranking are more likely.
+
+    Each ranking is drawn with the repeated insertion method: the alternatives of the reference ranking are inserted
+    one at a time, the i-th alternative (from 0) at position j with probability proportional to dispersion ** (i - j).
+    A dispersion of 0 gives the reference ranking every time and a dispersion of 1 is the impartial culture.
+
+    Parameters:
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+        dispersion (float): the dispersion parameter, between 0 and 1.
+        seed (int): the seed of the random number generator, the same seed gives the same profile.
+        reference (list): the reference ranking, by default [1, 2, ..., m].
+
+    Returns:
+        profile (PreferenceProfile): the generated preferences.
+    """
+    if not 0 <= dispersion <= 1:
+        raise ValueError("The dispersion must be between 0 and 1.")
+    generator = random.Random(seed)
+    if reference is None:
+        reference = list(range(1, m + 1))
+    # The insertion weights of the i-th alternative, for positions 0 to i.
+    insertion_weights = [list(accumulate(dispersion ** (i - j) for j in range(i + 1))) for i in range(m)]
+    rankings = array(smallest_typecode(m))
+    for agent in range(n):
+        ranking = []
+        for i, alternative in enumerate(reference):
+            position = generator.choices(range(i + 1), cum_weights=insertion_weights[i])[0]
+            ranking.insert(position, alternative)
+        rankings.extend(ranking)
+    return PreferenceProfile(rankings, m)
+
+def urn(n, m, replacement, seed=None):
+    """
+    Generates a profile from the Polya-Eggenberger urn model, where rankings already drawn are more likely to be drawn again.
+
+    The urn starts with one of each of the m! rankings. Each agent's ranking is drawn from the urn, then it is
+    put back with replacement extra copies. A replacement of 0 is the impartial culture.
+
+    Parameters:
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+        replacement (int): the number of extra copies put back after each draw.
+        seed (int): the seed of the random number generator, the same seed gives the same profile.
+
+    Returns:
+        profile (PreferenceProfile): the generated preferences.
+    """
+    generator = random.Random(seed)
+    rankings = array(smallest_typecode(m))
+    alternatives = list(range(1, m + 1))
+    orderings = factorial(m)
+    for agent in range(n):
+        # Either one of the m! original rankings is drawn, or one of the agent * replacement copies.
+        if generator.randrange(orderings + agent * replacement) < orderings:
+            generator.shuffle(alternatives)
+            rankings.extend(alternatives)
+        else:
+            copied = generator.randrange(agent)
+            rankings.extend(rankings[copied * m:(copied + 1) * m])
+    return PreferenceProfile(rankings, m)
+
+def single_peaked(n, m, seed=None, axis=None):
+    """
+    Generates a profile drawn uniformly from the rankings which are single-peaked on an axis.
+
+    Each ranking is built from the last position upwards: the least preferred remaining alternative is either the
+    leftmost or the rightmost remaining alternative on the axis, each with probability one half.
+
+    Parameters:
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+        seed (int): the seed of the random number generator, the same seed gives the same profile.
+        axis (list): the left to right order of the alternatives, by default [1, 2, ..., m].
+
+    Returns:
+        profile (PreferenceProfile): the generated preferences.
+    """
+    generator = random.Random(seed)
+    if axis is None:
+        axis = list(range(1, m + 1))
+    rankings = array(smallest_typecode(m))
+    for agent in range(n):
+        left = 0
+        right = m - 1
+        ranking = []
+        while left < right:
+            if generator.random() < 0.5:
+                ranking.append(axis[left])
+                left = left + 1
+            else:
+                ranking.append(axis[right])
+                right = right - 1
+        ranking.append(axis[left])
+        ranking.reverse()
+        rankings.extend(ranking)
+    return PreferenceProfile(rankings, m)
+
+# The preference models simulate() can draw elections from, and whether their agents are drawn independently
+# of each other, in which case a whole batch of elections is drawn in one call.
+SIMULATION_MODELS = {"impartial_culture": (impartial_culture, True),
+                     "mallows": (mallows, True),
+                     "urn": (urn, False),
+                     "single_peaked": (single_peaked, True)}
+
+def simulate(elections, n, m, rules=("plurality", "veto", "borda", "harmonic", "STV"), tie_break="min",
+             model="impartial_culture", model_parameters=(), batch_size=1000, seed=None, condorcet=False):
+    """
+    Simulates many random elections and compares the winners of several voting rules.
+
+    The elections are drawn in batches. Each batch is a single elections x agents x alternatives rankings array,
+    with the positions array the generator built alongside it, so every election is a view of those two arrays.
+    The positional rules are tallied for the whole batch at once: each position column a rule needs is counted
+    in one pass over the batch, keyed by election * m + alternative, and every rule's points are a weighted sum of
+    those counts. The score vectors are scaled to whole numbers (see integer_score_vector()) so every tie is exact.
+    STV and the pairwise rules are worked out one election at a time, the pairwise matrix only being built where a
+    pairwise rule or the Condorcet statistics need it. Only one batch is held at a time.
+
+    Parameters:
+        elections (int): the number of elections.
+        n (int): the number of agents in each election.
+        m (int): the number of alternatives in each election.
+        rules (list): the names of the rules, any of "plurality", "veto", "borda", "harmonic", "STV",
+        "copeland", "maximin" and "schulze".
+        tie_break (str or int): either "max", "min" or an integer i, the agent whose preferences break ties.
+        model (str): "impartial_culture", "mallows", "urn" or "single_peaked".
+        model_parameters (tuple): the model's parameters after n and m, e.g. (0.5,) for a mallows dispersion.
+        batch_size (int): the number of elections drawn and evaluated at a time.
+        seed (int): the seed of the random number generator, the same seed gives the same results.
+        condorcet (bool): if True each election's Condorcet winner is found too and the Condorcet statistics are returned.
+
+    Returns:
+        results (dict): with the keys
+            "elections" (int): the number of elections simulated.
+            "winner_counts" (dict): for each rule, a Counter of how often each alternative won.
+            "agreement" (dict): for each pair of rules, the fraction of elections where they had the same winner.
+            and where condorcet is True
+            "condorcet_winners" (float): the fraction of elections which had a Condorcet winner.
+            "condorcet_efficiency" (dict): for each rule, the fraction of those elections where it chose the Condorcet winner.
+    """
+    model_function, independent_agents = SIMULATION_MODELS[model]
+    generator = random.Random(seed)
+    vectors = {rule: integer_score_vector(score_vector)[0] for rule, score_vector in score_vectors(m).items()}
+    pairwise_rules = {"copeland": copeland, "maximin": maximin, "schulze": schulze}
+    positional_rules = [rule for rule in rules if rule in vectors]
+    other_rules = [rule for rule in rules if rule not in vectors]
+    needs_matrix = condorcet or any(rule in pairwise_rules for rule in rules)
+    # As in positional_tally(), each rule only needs the positions whose score differs from its most common score.
+    base_scores = {rule: Counter(vectors[rule]).most_common(1)[0][0] for rule in positional_rules}
+    positions_needed = sorted({position for rule in positional_rules
+                               for position, score in enumerate(vectors[rule]) if score != base_scores[rule]})
+    # The offset election * m of every row of a full batch, added to a column of alternatives to key its counts.
+    offsets = [election * m for election in range(min(batch_size, elections)) for agent in range(n)]
+    alternatives = range(1, m + 1)
+    winner_counts = {rule: Counter() for rule in rules}
+    agreements = {(first, second): 0 for index, first in enumerate(rules) for second in rules[index + 1:]}
+    condorcet_elections = 0
+    condorcet_agreements = dict.fromkeys(rules, 0)
+    matrix_size = n * m
+    for batch_start in range(0, elections, batch_size):
+        batch_elections = min(batch_size, elections - batch_start)
+        # Draws the whole batch as one rankings array of batch_elections * n rows.
+        if independent_agents:
+            batch_profile = model_function(batch_elections * n, m, *model_parameters, seed=generator.random())
+            rankings = batch_profile.rankings
+            positions = batch_profile.positions
+        else:
+            rankings = array(smallest_typecode(m))
+            positions = array(smallest_typecode(m))
+            for election in range(batch_elections):
+                election_profile = model_function(n, m, *model_parameters, seed=generator.random())
+                rankings.extend(election_profile.rankings)
+                positions.extend(election_profile.positions)
+        # Counts each needed position column for every election of the batch in one pass, map() stops at the
+        # end of the column so the offsets of a full batch serve a shorter last batch too.
+        column_counts = {position: Counter(map(add, rankings[position::m], offsets)) for position in positions_needed}
+        batch_points = {}
+        for rule in positional_rules:
+            totals = Counter()
+            for position, score in enumerate(vectors[rule]):
+                if score != base_scores[rule]:
+                    for key, count in column_counts[position].items():
+                        totals[key] += (score - base_scores[rule]) * count
+            batch_points[rule] = totals
+        rankings_view = memoryview(rankings)
+        positions_view = memoryview(positions)
+        for election in range(batch_elections):
+            start = election * matrix_size
+            profile = None
+            if other_rules or condorcet or isinstance(tie_break, int):
+                profile = PreferenceProfile(rankings_view[start:start + matrix_size], m,
+                                            positions=positions_view[start:start + matrix_size])
+            winners = {}
+            offset = election * m
+            for rule in positional_rules:
+                base_points = base_scores[rule] * n
+                totals = batch_points[rule]
+                points = {alternative: base_points + totals[offset + alternative] for alternative in alternatives}
+                # Finds the high score, then the alternative(s) with that score.
+                high_scores_list = tie_checker(points)
+                # Identifies if there is a tie, if so calls the tie_breaker function.
+                if len(high_scores_list) > 1:
+                    winners[rule] = int(tie_breaker(profile, tie_break, high_scores_list))
+                else:
+                    winners[rule] = high_scores_list[0]
+            matrix = pairwise_matrix(profile) if needs_matrix else None
+            for rule in other_rules:
+                if rule == "STV":
+                    winners[rule] = STV(profile, tie_break)
+                else:
+                    winners[rule] = pairwise_rules[rule](profile, tie_break, matrix)
+            for rule in rules:
+                winner_counts[rule][winners[rule]] += 1
+            for first, second in agreements:
+                if winners[first] == winners[second]:
+                    agreements[(first, second)] += 1
+            if condorcet:
+                winner = condorcet_winner(profile, matrix)
+                if winner is not None:
+                    condorcet_elections = condorcet_elections + 1
+                    for rule in rules:
+                        if winners[rule] == winner:
+                            condorcet_agreements[rule] += 1
+    results = {"elections": elections,
+               "winner_counts": winner_counts,
+               "agreement": {pair: count / elections for pair, count in agreements.items()}}
+    if condorcet:
+        results["condorcet_winners"] = condorcet_elections / elections
+        results["condorcet_efficiency"] = {rule: count / condorcet_elections if condorcet_elections else None
+                                           for rule, count in condorcet_agreements.items()}
+    return results
+
+# The version of the cache's keys, changing it makes every existing cache entry a miss.
+CACHE_VERSION = 1
+# The prefix and suffix of the temporary files entries are written to before they are moved into place.
+CACHE_TEMPORARY_PREFIX = ".vprf-"
+CACHE_TEMPORARY_SUFFIX = ".tmp"
+
+class ProfileCache:
+    """
+    A persistent cache of parsed profiles and rule results, keyed by a fingerprint of the worksheet's contents.
+
+    Profiles are stored as profile files (see save_profile()) and are memory-mapped again on a hit, rule results
+    are stored as JSON. Both are keyed by a SHA-256 fingerprint of the worksheet, so any change to the workbook
+    gives a new fingerprint and the old entries are never used again. The entries are kept under max_bytes by
+    deleting the least recently used ones, and the temporary files of writes which never finished (a job killed
+    part way) are deleted once they are older than temporary_grace. Other files in the directory are never touched.
+    The most recently used entries are also memoised in the process.
+
+    Parameters:
+        directory (str): the cache directory, created if it does not exist.
+        max_bytes (int): the largest total size of the entries in the directory.
+        memo_size (int): the number of profiles and results kept in memory.
+        temporary_grace (float): how long, in seconds, a temporary file may go unmodified before it is taken as abandoned.
+    """
+    def __init__(self, directory, max_bytes=1 << 30, memo_size=64, temporary_grace=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memo_size = memo_size
+        self.temporary_grace = temporary_grace
+        self.memo = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def fingerprint(self, values, sheet=None):
+        """
+        The content hash of a worksheet.
+
+        Parameters:
+            values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file whose bytes are hashed.
+            sheet (str): the name of the worksheet in the file, by default the active worksheet.
+
+        Returns:
+            fingerprint (str): the hexadecimal SHA-256 digest.
+        """
+        digest = hashlib.sha256(f"{CACHE_VERSION}:{sheet}:".encode())
+        if hasattr(values, "iter_rows"):
+            for chunk in worksheet_chunks(values):
+                digest.update(repr(chunk).encode())
+        else:
+            with open(values, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def remember(self, key, value):
+        """
+        Memoises a value in the process, forgetting the least recently used value when the memo is full.
+
+        Parameters:
+            key (str): the cache key.
+            value: the profile or result.
+        """
+        self.memo[key] = value
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+
+    def recall(self, key, extension):
+        """
+        Looks a key up in the memo, then on disk, marking it as recently used.
+
+        Parameters:
+            key (str): the cache key.
+            extension (str): the file extension, ".vprf" for profiles or ".json" for results.
+
+        Returns:
+            (found, value) (tuple): whether the key was found and its profile or result.
+        """
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            return True, self.memo[key]
+        filename = os.path.join(self.directory, key + extension)
+        try:
+            if extension == ".vprf":
+                value = load_profile(filename)
+            else:
+                with open(filename) as file:
+                    value = json.load(file)
+            os.utime(filename)
+        except (OSError, ValueError):
+            return False, None
+        self.remember(key, value)
+        return True, value
+
+    @staticmethod
+    def is_entry(name):
+        """
+        Whether a file name is one of this cache's entries, a 64 digit hexadecimal key with a .vprf or .json extension.
+
+        Parameters:
+            name (str): the file name.
+
+        Returns:
+            is_entry (bool): whether the name is an entry's.
+        """
+        key, extension = os.path.splitext(name)
+        return extension in (".vprf", ".json") and len(key) == 64 and all(digit in "0123456789abcdef" for digit in key)
+
+    def store(self, key, extension, value):
+        """
+        Writes an entry to a temporary file, then moves it into place, so no one ever reads a half-written entry.
+
+        Parameters:
+            key (str): the cache key.
+            extension (str): the file extension, ".vprf" for profiles or ".json" for results.
+            value: the profile or result.
+        """
+        descriptor, temporary = tempfile.mkstemp(suffix=CACHE_TEMPORARY_SUFFIX, prefix=CACHE_TEMPORARY_PREFIX, dir=self.directory)
+        try:
+            if extension == ".vprf":
+                os.close(descriptor)
+                save_profile(value, temporary)
+            else:
+                with os.fdopen(descriptor, "w") as file:
+                    json.dump(value, file)
+            os.replace(temporary, os.path.join(self.directory, key + extension))
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+    def evict(self):
+        """
+        Deletes abandoned temporary files, then the least recently used entries until they are no bigger than max_bytes.
+        """
+        entries = []
+        abandoned = time() - self.temporary_grace
+        with os.scandir(self.directory) as directory:
+            for entry in directory:
+                # Only the files this cache wrote are counted or deleted, anything else in the directory is left alone.
+                temporary = entry.name.startswith(CACHE_TEMPORARY_PREFIX) and entry.name.endswith(CACHE_TEMPORARY_SUFFIX)
+                if not (temporary or self.is_entry(entry.name)) or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    status = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if not temporary:
+                    entries.append((status.st_mtime, status.st_size, entry.path))
+                elif status.st_mtime < abandoned:
+                    # A write which never finished, one still being written is newer than the grace period.
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        total = sum(size for modified, size, filename in entries)
+        for modified, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                # Another job sharing the directory deleted it first.
+                pass
+            total = total - size
+
+    def preferences(self, values, sheet=None):
+        """
+        The profile of a worksheet, read with stream_preferences() unless it is already cached.
+
+        Parameters:
+            values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file.
+            sheet (str): the name of the worksheet in the file, by default the active worksheet.
+
+        Returns:
+            profile (PreferenceProfile): the preferences, with their range totals.
+        """
+        return self.cached_preferences(self.fingerprint(values, sheet), values, sheet)
+
+    def cached_preferences(self, fingerprint, values, sheet):
+        """
+        The profile of a worksheet whose fingerprint is already known.
+
+        Parameters:
+            fingerprint (str): the worksheet's fingerprint.
+            values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file.
+            sheet (str): the name of the worksheet in the file.
+
+        Returns:
+            profile (PreferenceProfile): the preferences, with their range totals.
+        """
+        found, profile = self.recall(fingerprint, ".vprf")
+        if found:
+            return profile
+        if sheet is not None and not hasattr(values, "iter_rows"):
+            values = open_worksheet(values, sheet)
+        profile = stream_preferences(values)
+        self.store(fingerprint, ".vprf", profile)
+        self.remember(fingerprint, profile)
+        self.evict()
+        return profile
+
+    def rule(self, values, rule, tie_break, score_vector=None, sheet=None):
+        """
+        The winner and tally of a rule on a worksheet, computed unless it is already cached.
+
+        Parameters:
+            values (openpyxl worksheet or str): the worksheet, or the path of an .xlsx file.
+            rule (str): "plurality", "veto", "borda", "harmonic", "scoring_rule", "STV", "range_voting",
+            "copeland", "maximin" or "schulze".
+            tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+            score_vector (list): the score vector where the rule is "scoring_rule".
+            sheet (str): the name of the worksheet in the file, by default the active worksheet.
+
+        Returns:
+            result (dict): "winner" (int) and "tally", a list of [alternative, points] pairs,
+            or for STV a list of the tallies of each round.
+        """
+        fingerprint = self.fingerprint(values, sheet)
+        key = hashlib.sha256(json.dumps([fingerprint, rule, score_vector, tie_break]).encode()).hexdigest()
+        found, result = self.recall(key, ".json")
+        if found:
+            return result
+        profile = self.cached_preferences(fingerprint, values, sheet)
+        if rule == "STV":
+            winner, round_tallies = STV(profile, tie_break, rounds=True)
+            tally = [[[alternative, points[alternative]] for alternative in points] for points in round_tallies]
+        else:
+            if rule == "scoring_rule":
+                points = positional_tally(profile, sorted(score_vector, reverse=True))
+            elif rule == "range_voting":
+                points = profile.range_totals
+            elif rule in ("copeland", "maximin", "schulze"):
+                points = pairwise_matrix(profile)
+            else:
+                points = positional_tally(profile, score_vectors(profile.m)[rule])
+            if rule in ("copeland", "maximin", "schulze"):
+                winner = {"copeland": copeland, "maximin": maximin, "schulze": schulze}[rule](profile, tie_break, points)
+                tally = [[a, [[b, points[a][b]] for b in points[a]]] for a in points]
+            else:
+                # Finds the high score, then the alternative(s) with that score.
+                high_scores_list = tie_checker(points)
+                # Identifies if there is a tie, if so calls the tie_breaker function.
+                if len(high_scores_list) > 1:
+                    winner = tie_breaker(profile, tie_break, high_scores_list)
+                else:
+                    winner = high_scores_list[0]
+                tally = [[alternative, points[alternative]] for alternative in points]
+        result = {"winner": int(winner), "tally": tally}
+        self.store(key, ".json", result)
+        self.remember(key, result)
+        self.evict()
+        return result
+
+def order_tied(preferences, tie_break, high_scores_list):
+    """
+    Orders tied alternatives by applying the tie-break rule again and again.
+
+    The tie_breaker function picks the first alternative, then it picks the next from the ones left, and so on.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        high_scores_list (list): the tied alternatives.
+
+    Returns:
+        order (list): the tied alternatives from first to last.
+    """
+    remaining = list(high_scores_list)
+    order = []
+    while len(remaining) > 1:
+        winner = tie_breaker(preferences, tie_break, remaining)
+        order.append(winner)
+        remaining.remove(winner)
+    return order + remaining
+
+def ranking_from_points(preferences, points, tie_break, k=None):
+    """
+    Ranks the alternatives by their points, from the most to the fewest, breaking ties at every position.
+
+    Where only the top k are wanted, the k highest scores are found with a heap first and only the
+    alternatives scoring at least the k-th highest score are sorted.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        points (dict): a dictionary where alternatives are the keys and the points are the values.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        k (int): the number of alternatives wanted, by default all of them.
+
+    Returns:
+        ranking (list): the alternatives from first to last.
+    """
+    if k is not None and k < len(points):
+        if k < 1:
+            return []
+        lowest_score = heapq.nlargest(k, points.values())[-1]
+        points = {alternative: score for alternative, score in points.items() if score >= lowest_score}
+    ranking = []
+    for score, group in groupby(sorted(points, key=points.__getitem__, reverse=True), key=points.__getitem__):
+        ranking.extend(order_tied(preferences, tie_break, list(group)))
+    return ranking[:k]
+
+def stv_ranking(preferences, tie_break):
+    """
+    Ranks the alternatives by STV in one run: the winner first, then the alternatives in reverse order of elimination.
+
+    Alternatives eliminated in the same round, and the alternatives left in the last round, are ordered by the tie-break rule.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        ranking (list): the alternatives from first to last.
+    """
+    winner, round_tallies = STV(preferences, tie_break, rounds=True)
+    # The last round's lowest alternatives were eliminated unless every alternative was the lowest.
+    last_round = round_tallies[-1]
+    lowest = min(last_round.values())
+    remaining = [alternative for alternative in last_round if last_round[alternative] != lowest] or list(last_round)
+    ranking = order_tied(preferences, tie_break, remaining)
+    survivors = set(remaining)
+    for points in reversed(round_tallies):
+        eliminated = [alternative for alternative in points if alternative not in survivors]
+        ranking.extend(order_tied(preferences, tie_break, eliminated))
+        survivors.update(eliminated)
+    return ranking
+
+def social_ranking(preferences, rule, tie_break, k=None, score_vector=None):
+    """
+    Ranks all of the alternatives by a voting rule, or only the top k, from a single evaluation of the rule.
+
+    The first alternative is always the rule's winner. The tie-break rule is applied at every position.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function,
+        or for range voting a worksheet, an .xlsx path or a profile with range totals.
+        rule (str): "plurality", "veto", "borda", "harmonic", "scoring_rule", "range_voting", "STV", "copeland",
+        "maximin", "schulze" or "dictatorship".
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        For "dictatorship" this is the agent, whose ranking is the result.
+        k (int): the number of alternatives wanted, by default all of them.
+        score_vector (list): the score vector where the rule is "scoring_rule".
+
+    Returns:
+        ranking (list): the alternatives from first to last.
+    """
+    if rule == "range_voting":
+        if not (isinstance(preferences, PreferenceProfile) and preferences.range_totals is not None):
+            preferences = stream_preferences(preferences)
+        return ranking_from_points(preferences, preferences.range_totals, tie_break, k)
+    if rule == "dictatorship":
+        if tie_break not in preferences:
+            raise ValueError(f"Inputted integer {tie_break} does not correspond to an agent.")
+        return list(preferences[tie_break])[:k]
+    if rule == "STV":
+        return stv_ranking(preferences, tie_break)[:k]
+    if rule in ("copeland", "maximin", "schulze"):
+        matrix = pairwise_matrix(preferences)
+        if rule == "copeland":
+            return ranking_from_points(preferences, copeland_points(matrix), tie_break, k)
+        if rule == "maximin":
+            return ranking_from_points(preferences, maximin_points(matrix), tie_break, k)
+        # Each place goes to the unbeaten alternatives left, as the Schulze winner does among all of them.
+        strength = schulze_strengths(matrix)
+        remaining = list(matrix)
+        ranking = []
+        while remaining and (k is None or len(ranking) < k):
+            unbeaten = [a for a in remaining if all(strength[a][b] >= strength[b][a] for b in remaining if b != a)]
+            winner = tie_breaker(preferences, tie_break, unbeaten) if len(unbeaten) > 1 else unbeaten[0]
+            ranking.append(winner)
+            remaining.remove(winner)
+        return ranking
+    if rule == "scoring_rule":
+        points = positional_tally(preferences, sorted(score_vector, reverse=True))
+    else:
+        points = positional_tally(preferences, score_vectors(alternatives_count(preferences))[rule])
+    return ranking_from_points(preferences, points, tie_break, k)
+
+def tie_winner_order(preferences, tie_break, agent):
+    """
+    Finds how the tie-break rule orders the alternatives when a given agent may change their ballot.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        agent (int): the agent changing their ballot.
+
+    Returns:
+        order (dict): the alternatives as keys and their place in the tie-break order as values, lower winning,
+        or None where the agent is the tie-break agent, so their own ballot decides ties.
+    """
+    m = alternatives_count(preferences)
+    if tie_break == "min":
+        return {alternative: alternative for alternative in range(1, m + 1)}
+    if tie_break == "max":
+        return {alternative: -alternative for alternative in range(1, m + 1)}
+    if tie_break == agent:
+        return None
+    return {alternative: position for position, alternative in enumerate(preferences[tie_break])}
+
+def positional_manipulation(preferences, score_vector, tie_break):
+    """
+    Finds the pivotal agents of a positional scoring rule and the agents who can manipulate it.
+
+    An agent is pivotal if some other ballot from them changes the winner, and can manipulate the rule if some
+    other ballot makes an alternative they prefer to the winner win. The totals are tallied once with the scores
+    scaled to whole numbers by integer_score_vector(), so ties are exact; for fractional scores such as harmonic's this can
+    differ from the rule itself where its floating point totals miss an exact tie. For each agent their own ballot is taken off the totals
+    in O(m). To make an alternative c win, the agent ranks c first and gives the lowest remaining scores to the
+    alternatives closest to beating c, which is checked in O(m log m). Alternatives more than twice the score range behind the
+    winner are skipped, as one ballot can never close that gap. Agents with the same ranking share the work.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        score_vector (list): the score vector, the highest score is given to the top ranked alternative as in scoring_rule().
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        analysis (dict): the "winner", a list of the "pivotal" agents and "manipulations", a dictionary of each
+        agent who can manipulate with a (target, ballot) pair for the alternative they most prefer of those they can make win.
+    """
+    profile = as_profile(preferences)
+    m = profile.m
+    scores = integer_score_vector(sorted(score_vector, reverse=True))[0]
+    totals = positional_tally(profile, scores)
+    # Finds the high score, then the alternative(s) with that score.
+    high_scores_list = tie_checker(totals)
+    # Identifies if there is a tie, if so calls the tie_breaker function.
+    if len(high_scores_list) > 1:
+        winner = int(tie_breaker(preferences, tie_break, high_scores_list))
+    else:
+        winner = int(high_scores_list[0])
+    analysis = {"winner": winner, "pivotal": [], "manipulations": {}}
+    # One ballot moves any two alternatives' totals apart by at most twice the score range.
+    reach = 2 * (scores[0] - scores[-1])
+    contenders = [alternative for alternative in totals if alternative != winner and totals[winner] - totals[alternative] <= reach]
+    if not contenders:
+        return analysis
+    shared_order = tie_winner_order(profile, tie_break, None)
+    results = {}
+    for agent in profile:
+        row_start = profile.row(agent) * m
+        ranking = tuple(profile.rankings[row_start:row_start + m])
+        key = ranking if tie_break != agent else (ranking, agent)
+        if key not in results:
+            order = shared_order if tie_break != agent else None
+            # Takes the agent's own ballot off the totals.
+            others = dict(totals)
+            for position, alternative in enumerate(ranking):
+                others[alternative] -= scores[position]
+            reachable = {}
+            for target in contenders:
+                target_points = others[target] + scores[0]
+                # The most points each other alternative can take without beating the target, allowing for ties.
+                limits = {alternative: target_points - others[alternative] - (0 if order is None or order[target] < order[alternative] else 1)
+                          for alternative in others if alternative != target}
+                rest = sorted(limits, key=limits.__getitem__)
+                if all(scores[m - 1 - place] <= limits[alternative] for place, alternative in enumerate(rest)):
+                    reachable[target] = [target] + rest[::-1]
+            targets = [alternative for alternative in ranking[:ranking.index(winner)] if alternative in reachable]
+            results[key] = (bool(reachable), (targets[0], reachable[targets[0]]) if targets else None)
+        pivotal, manipulation = results[key]
+        if pivotal:
+            analysis["pivotal"].append(agent)
+        if manipulation is not None:
+            analysis["manipulations"][agent] = manipulation
+    return analysis
+
+def stv_manipulation(preferences, tie_break):
+    """
+    Finds the pivotal agents of STV and the agents who can manipulate it.
+
+    Where no round of the honest election is within two votes of going differently, no single ballot can change
+    any elimination and nobody is pivotal, so nothing more is searched. Otherwise each distinct ranking is searched once.
+    A ballot only matters through which remaining alternative it supports each round, and which alternative
+    every other ballot supports depends only on the set of remaining alternatives, so the search is over
+    (remaining alternatives, supported alternative) states, each of which is worked out only once.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        analysis (dict): the "winner", a list of the "pivotal" agents and "manipulations", a dictionary of each
+        agent who can manipulate with a (target, ballot) pair for the alternative they most prefer of those they can make win.
+    """
+    profile = as_profile(preferences)
+    m = profile.m
+    winner, round_tallies = STV(preferences, tie_break, rounds=True)
+    analysis = {"winner": winner, "pivotal": [], "manipulations": {}}
+    # One ballot moves one vote between two alternatives a round. A round is safe if that cannot change who
+    # is eliminated, nor make the alternatives left all equal and end the election early.
+    safe = True
+    for points in round_tallies:
+        values = sorted(points.values())
+        if len(values) == 1:
+            continue
+        survivors = values[1:]
+        if values[0] == values[1] or values[1] - values[0] <= 2 or (len(survivors) > 1 and survivors[-1] - survivors[0] <= 2):
+            safe = False
+            break
+    if safe:
+        return analysis
+    classes = profile if isinstance(profile, AnonymousProfile) else AnonymousProfile.from_profile(profile)
+    rankings = classes.rankings
+    tie_order = tie_winner_order(preferences, tie_break, None)
+    results = {}
+    for agent in profile:
+        ballot_class = classes.row(agent)
+        tie_agent = tie_break == agent
+        key = (ballot_class, tie_agent)
+        if key not in results:
+            weights = list(classes.weights)
+            weights[ballot_class] -= 1
+            first_choices = {}
+            states = {}
+
+            def others_points(remaining):
+                # The first place counts of every other ballot given the remaining alternatives.
+                if remaining not in first_choices:
+                    points = dict.fromkeys(remaining, 0)
+                    for ballot in range(classes.rows):
+                        if weights[ballot]:
+                            pointer = ballot * m
+                            while rankings[pointer] not in remaining:
+                                pointer = pointer + 1
+                            points[rankings[pointer]] += weights[ballot]
+                    first_choices[remaining] = points
+                return first_choices[remaining]
+
+            def search(remaining, support):
+                # The winners the ballot can still bring about, each with the alternatives it supports from here on.
+                if (remaining, support) in states:
+                    return states[(remaining, support)]
+                points = dict(others_points(remaining))
+                points[support] += 1
+                lowest = min(points.values())
+                lowest_alternatives = [alternative for alternative in points if points[alternative] == lowest]
+                left = remaining
+                if len(lowest_alternatives) < len(remaining):
+                    left = remaining - frozenset(lowest_alternatives)
+                winners = {}
+                if len(set(points[alternative] for alternative in left)) == 1:
+                    if len(left) == 1:
+                        winners[next(iter(left))] = [support] if support in left else [support, next(iter(left))]
+                    elif not tie_agent:
+                        winners[min(left, key=tie_order.__getitem__)] = [support]
+                    elif support in left:
+                        winners[support] = [support]
+                    else:
+                        # The agent's next choice is theirs to make and decides the tie.
+                        for alternative in left:
+                            winners[alternative] = [support, alternative]
+                elif support in left:
+                    for alternative, sequence in search(left, support).items():
+                        winners[alternative] = [support] + sequence[1:]
+                else:
+                    for choice in sorted(left):
+                        for alternative, sequence in search(left, choice).items():
+                            winners.setdefault(alternative, [support] + sequence)
+                states[(remaining, support)] = winners
+                return winners
+
+            reachable = {}
+            everyone = frozenset(range(1, m + 1))
+            for support in range(1, m + 1):
+                for alternative, sequence in search(everyone, support).items():
+                    reachable.setdefault(alternative, sequence + [a for a in range(1, m + 1) if a not in sequence])
+            row_start = ballot_class * m
+            ranking = rankings[row_start:row_start + m].tolist()
+            targets = [alternative for alternative in ranking[:ranking.index(winner)] if alternative in reachable]
+            pivotal = any(alternative != winner for alternative in reachable)
+            results[key] = (pivotal, (targets[0], reachable[targets[0]]) if targets else None)
+        pivotal, manipulation = results[key]
+        if pivotal:
+            analysis["pivotal"].append(agent)
+        if manipulation is not None:
+            analysis["manipulations"][agent] = manipulation
+    return analysis
+
+def manipulation_analysis(preferences, tie_break, rules=("plurality", "veto", "borda", "harmonic", "STV"), score_vector=None):
+    """
+    Audits which agents are pivotal and which can manipulate each rule by misreporting their preferences.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        rules (tuple): the names of the rules, any of "plurality", "veto", "borda", "harmonic", "scoring_rule" and "STV".
+        score_vector (list): the score vector where "scoring_rule" is one of the rules.
+
+    Returns:
+        analyses (dict): the rule names as keys and the result of positional_manipulation() or stv_manipulation() as values.
+    """
+    profile = as_profile(preferences)
+    vectors = score_vectors(profile.m)
+    analyses = {}
+    for rule in rules:
+        if rule == "STV":
+            analyses[rule] = stv_manipulation(preferences, tie_break)
+        elif rule == "scoring_rule":
+            analyses[rule] = positional_manipulation(preferences, score_vector, tie_break)
+        else:
+            analyses[rule] = positional_manipulation(preferences, vectors[rule], tie_break)
+    return analyses
+
+def ballot_classes(preferences):
+    """
+    Groups identical ballots, giving each distinct ballot with the number of agents who gave it.
+
+    Parameters:
+        preferences (dict/PreferenceProfile/TruncatedProfile): the preferences.
+
+    Returns:
+        classes (list): a (ballot, weight) pair for each distinct ballot, the ballot a tuple of alternatives.
+    """
+    if isinstance(preferences, TruncatedProfile):
+        entries = preferences.entries
+        starts = preferences.starts
+        return list(Counter(tuple(entries[starts[ballot]:starts[ballot + 1]]) for ballot in range(preferences.n)).items())
+    profile = as_profile(preferences)
+    if not isinstance(profile, AnonymousProfile):
+        profile = AnonymousProfile.from_profile(profile)
+    m = profile.m
+    return [(tuple(profile.rankings[row * m:(row + 1) * m]), profile.weights[row]) for row in range(profile.rows)]
+
+def k_borda(preferences, k, tie_break):
+    """
+    The committee is the k alternatives with the highest Borda scores.
+
+    Parameters:
+        preferences (dict/PreferenceProfile/TruncatedProfile): the preferences returned from the generate_preferences() function.
+        k (int): the size of the committee.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        committee (list): the k alternatives, from the highest score to the lowest.
+    """
+    points = positional_tally(preferences, score_vectors(alternatives_count(preferences))["borda"])
+    return ranking_from_points(preferences, points, tie_break, k)
+
+def bloc(preferences, k, tie_break):
+    """
+    Each agent gives a point to each of their top k alternatives, the committee is the k alternatives with the most points.
+
+    Parameters:
+        preferences (dict/PreferenceProfile/TruncatedProfile): the preferences returned from the generate_preferences() function.
+        k (int): the size of the committee.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        committee (list): the k alternatives, from the most points to the fewest.
+    """
+    m = alternatives_count(preferences)
+    points = positional_tally(preferences, [1] * min(k, m) + [0] * (m - min(k, m)))
+    return ranking_from_points(preferences, points, tie_break, k)
+
+def stv_committee(preferences, k, tie_break):
+    """
+    Elects a committee of k by STV with the Droop quota and fractional surplus transfers.
+
+    The quota is floor(n / (k + 1)) + 1 agents. Each round the alternative with the most points is elected if it
+    reaches the quota, and every ballot it heads is passed on to its next hopeful alternative at its weight times
+    surplus / points, so exactly its surplus moves on. Otherwise the alternative with the fewest points is eliminated
+    and its ballots move on at their full weight, all the alternatives without a vote going at once where enough
+    alternatives would be left to fill the committee. Ballots are handled a class of identical ballots at a time, each
+    class with one weight, and every alternative keeps a bucket of the classes it heads, so a transfer only touches
+    the bucket moving. Ballots with no hopeful alternative left are exhausted. The weights become Fractions at their
+    first surplus transfer, so the transfers are exact. Once the hopeful alternatives only just fill the committee they are all elected.
+
+    Parameters:
+        preferences (dict/PreferenceProfile/TruncatedProfile): the preferences returned from the generate_preferences() function.
+        k (int): the size of the committee.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        Among tied alternatives the one the tie-break rule picks is elected first and eliminated last.
+
+    Returns:
+        committee (list): the elected alternatives in the order they were elected.
+    """
+    m = alternatives_count(preferences)
+    classes = ballot_classes(preferences)
+    quota = sum(weight for ballot, weight in classes) // (k + 1) + 1
+    # The weights stay whole numbers until a surplus transfer makes them Fractions.
+    weights = [weight for ballot, weight in classes]
+    pointers = [0] * len(classes)
+    buckets = {alternative: [] for alternative in range(1, m + 1)}
+    bucket_points = dict.fromkeys(range(1, m + 1), 0)
+    for index, (ballot, weight) in enumerate(classes):
+        if ballot:
+            buckets[ballot[0]].append(index)
+            bucket_points[ballot[0]] += weights[index]
+    hopeful = set(range(1, m + 1))
+    committee = []
+
+    def move_on(alternative):
+        # Passes the ballots headed by an alternative which is no longer hopeful to their next hopeful alternative.
+        for index in buckets.pop(alternative):
+            ballot = classes[index][0]
+            pointer = pointers[index] + 1
+            while pointer < len(ballot) and ballot[pointer] not in hopeful:
+                pointer = pointer + 1
+            pointers[index] = pointer
+            if pointer < len(ballot):
+                buckets[ballot[pointer]].append(index)
+                bucket_points[ballot[pointer]] += weights[index]
+
+    while len(committee) < k and hopeful:
+        points = {alternative: bucket_points[alternative] for alternative in hopeful}
+        if len(committee) + len(hopeful) <= k:
+            committee.extend(ranking_from_points(preferences, points, tie_break))
+            break
+        if max(points.values()) >= quota:
+            # Finds the high score, then the alternative(s) with that score.
+            high_scores_list = tie_checker(points)
+            # Identifies if there is a tie, if so calls the tie_breaker function.
+            if len(high_scores_list) > 1:
+                elected = tie_breaker(preferences, tie_break, sorted(high_scores_list))
+            else:
+                elected = high_scores_list[0]
+            committee.append(int(elected))
+            hopeful.discard(elected)
+            surplus_factor = Fraction(points[elected] - quota) / points[elected]
+            for index in buckets[elected]:
+                weights[index] *= surplus_factor
+            move_on(elected)
+        else:
+            lowest = min(points.values())
+            lowest_alternatives = sorted(alternative for alternative in hopeful if points[alternative] == lowest)
+            if lowest == 0 and len(committee) + len(hopeful) - len(lowest_alternatives) >= k:
+                # Alternatives without a vote would be eliminated one after another with nothing to transfer.
+                hopeful.difference_update(lowest_alternatives)
+                for alternative in lowest_alternatives:
+                    buckets.pop(alternative)
+                continue
+            eliminated = order_tied(preferences, tie_break, lowest_alternatives)[-1]
+            hopeful.discard(eliminated)
+            move_on(eliminated)
+    return committee
+
+def greedy_chamberlin_courant(preferences, k, tie_break):
+    """
+    Chooses a committee of k greedily under the Chamberlin-Courant rule with Borda utilities.
+
+    Each agent is represented by the committee member they rank highest and values an alternative at position j
+    (from 0) at m - 1 - j, an unranked alternative at 0. Each step adds the alternative which raises the total
+    value of the agents' representatives the most. The marginal gain of every alternative is kept and updated
+    as agents get a better representative, only for those agents, rather than recomputed each step.
+    Identical ballots are handled together.
+
+    Parameters:
+        preferences (dict/PreferenceProfile/TruncatedProfile): the preferences returned from the generate_preferences() function.
+        k (int): the size of the committee.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+
+    Returns:
+        committee (list): the alternatives in the order they were chosen.
+    """
+    m = alternatives_count(preferences)
+    classes = ballot_classes(preferences)
+    utilities = [{alternative: m - 1 - position for position, alternative in enumerate(ballot)} for ballot, weight in classes]
+    supporters = {alternative: [] for alternative in range(1, m + 1)}
+    gains = dict.fromkeys(range(1, m + 1), 0)
+    for index, (ballot, weight) in enumerate(classes):
+        for alternative, utility in utilities[index].items():
+            if utility > 0:
+                supporters[alternative].append(index)
+                gains[alternative] += weight * utility
+    represented = [0] * len(classes)
+    committee = []
+    while len(committee) < min(k, m):
+        points = {alternative: gains[alternative] for alternative in gains if alternative not in committee}
+        # Finds the high score, then the alternative(s) with that score.
+        high_scores_list = tie_checker(points)
+        # Identifies if there is a tie, if so calls the tie_breaker function.
+        if len(high_scores_list) > 1:
+            chosen = tie_breaker(preferences, tie_break, high_scores_list)
+        else:
+            chosen = high_scores_list[0]
+        committee.append(int(chosen))
+        # Only the agents who value the new member above their representative change anyone's gain.
+        for index in supporters[chosen]:
+            utility = utilities[index][chosen]
+            previous = represented[index]
+            if utility > previous:
+                weight = classes[index][1]
+                for alternative, value in utilities[index].items():
+                    if value > previous:
+                        gains[alternative] -= weight * (min(value, utility) - previous)
+                represented[index] = utility
+    return committee
+
+def greedy_pav(preferences, k, tie_break, approvals=None):
+    """
+    Chooses a committee of k greedily under Proportional Approval Voting.
+
+    Each agent approves their top ranked alternatives and values a committee with h of them at 1 + 1/2 + ... + 1/h.
+    Each step adds the alternative with the largest total marginal gain, an agent with h approved members adding
+    1/(h + 1) to each alternative they approve. The gains are kept as whole numbers, scaled by the least common
+    multiple of 1 to k + 1, so they are exact, and only the gains of alternatives approved by agents who gained a
+    member are updated each step. Identical ballots are handled together.
+
+    Parameters:
+        preferences (dict/PreferenceProfile/TruncatedProfile): the preferences returned from the generate_preferences() function.
+        k (int): the size of the committee.
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        approvals (int): the number of top ranked alternatives each agent approves, by default k,
+        or for a TruncatedProfile every alternative the agent ranks.
+
+    Returns:
+        committee (list): the alternatives in the order they were chosen.
+    """
+    m = alternatives_count(preferences)
+    if approvals is None and not isinstance(preferences, TruncatedProfile):
+        approvals = k
+    classes = ballot_classes(preferences)
+    approved = [ballot[:approvals] for ballot, weight in classes]
+    scale = lcm(*range(1, k + 2))
+    supporters = {alternative: [] for alternative in range(1, m + 1)}
+    gains = dict.fromkeys(range(1, m + 1), 0)
+    for index, (ballot, weight) in enumerate(classes):
+        for alternative in approved[index]:
+            supporters[alternative].append(index)
+            gains[alternative] += weight * scale
+    members = [0] * len(classes)
+    committee = []
+    while len(committee) < min(k, m):
+        points = {alternative: gains[alternative] for alternative in gains if alternative not in committee}
+        # Finds the high score, then the alternative(s) with that score.
+        high_scores_list = tie_checker(points)
+        # Identifies if there is a tie, if so calls the tie_breaker function.
+        if len(high_scores_list) > 1:
+            chosen = tie_breaker(preferences, tie_break, high_scores_list)
+        else:
+            chosen = high_scores_list[0]
+        committee.append(int(chosen))
+        for index in supporters[chosen]:
+            h = members[index]
+            decrease = classes[index][1] * (scale // (h + 1) - scale // (h + 2))
+            for alternative in approved[index]:
+                gains[alternative] -= decrease
+            members[index] = h + 1
+    return committee
+
+def binomial(generator, n, p):
+    """
+    Draws from the binomial distribution, the number of successes in n trials each succeeding with probability p.
+
+    Small means count geometric gaps between successes, larger ones use Hormann's transformed rejection with
+    squeeze (BTRS), so a draw takes about the same time however large n is. This is the method of
+    random.binomialvariate() in Python 3.12, written out so draws from a seed are the same on every Python version.
+
+    Parameters:
+        generator (random.Random): the random number generator.
+        n (int): the number of trials.
+        p (float): the probability of success.
+
+    Returns:
+        successes (int): the number of successes.
+    """
+    if p <= 0.0 or n == 0:
+        return 0
+    if p >= 1.0:
+        return n
+    if p > 0.5:
+        return n - binomial(generator, n, 1.0 - p)
+    if n * p < 10.0:
+        successes = trials = 0
+        log_failure = log(1.0 - p)
+        if not log_failure:
+            return 0
+        while True:
+            trials += floor(log(generator.random()) / log_failure) + 1
+            if trials > n:
+                return successes
+            successes += 1
+    spq = sqrt(n * p * (1.0 - p))
+    b = 1.15 + 2.53 * spq
+    a = -0.0873 + 0.0248 * b + 0.01 * p
+    c = n * p + 0.5
+    vr = 0.92 - 4.2 / b
+    alpha = (2.83 + 5.1 / b) * spq
+    lpq = log(p / (1.0 - p))
+    mode = floor((n + 1) * p)
+    h = lgamma(mode + 1) + lgamma(n - mode + 1)
+    while True:
+        u = generator.random() - 0.5
+        us = 0.5 - fabs(u)
+        k = floor((2.0 * a / us + b) * u + c)
+        if k < 0 or k > n:
+            continue
+        v = generator.random()
+        # The squeeze accepts most draws without working out the probability of k.
+        if us >= 0.07 and v <= vr:
+            return k
+        v *= alpha / (a / (us * us) + b)
+        if log(v) <= h - lgamma(k + 1) - lgamma(n - k + 1) + (k - mode) * lpq:
+            return k
+
+def multinomial(generator, n, weights):
+    """
+    Draws n items with replacement from classes with the given weights, as a binomial draw for each class in turn.
+
+    Parameters:
+        generator (random.Random): the random number generator.
+        n (int): the number of items.
+        weights (list): the weight of each class.
+
+    Returns:
+        counts (array): the number of items drawn from each class.
+    """
+    counts = array("Q", bytes(8 * len(weights)))
+    remaining_weight = sum(weights)
+    for index, weight in enumerate(weights):
+        if n == 0:
+            break
+        drawn = binomial(generator, n, weight / remaining_weight) if weight < remaining_weight else n
+        counts[index] = drawn
+        n -= drawn
+        remaining_weight -= weight
+    return counts
+
+def bootstrap_winners(classes, weights, agent_classes, agents, rules, tie_break, seed, start, stop):
+    """
+    Finds the winners of resampled elections start to stop - 1 of a bootstrap.
+
+    Resample i draws n agents with replacement, which is a multinomial draw of n over the ballot classes weighted
+    by their counts, made by multinomial() with a random number generator seeded with the seed and i, in time
+    proportional to the number of classes rather than n. Each resample is an
+    AnonymousProfile over the same rankings with the drawn weights, so every rule runs on the ballot classes rather than the agents.
+
+    Parameters:
+        classes (PreferenceProfile): one row for each distinct ranking.
+        weights (array): the number of agents giving each ranking.
+        agent_classes (array): the row of each agent's ranking, used by an agent tie-break.
+        agents (list): the agent numbers, or None for 1 to n.
+        rules (list): the names of the rules, as in evaluate_all().
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        seed (int): the seed of the bootstrap.
+        start (int): the first resample.
+        stop (int): the resample after the last.
+
+    Returns:
+        winner_counts (dict): the rule names as keys and Counters of how often each alternative won as values.
+    """
+    weights = list(weights)
+    n = sum(weights)
+    winner_counts = {rule: Counter() for rule in rules}
+    for sample in range(start, stop):
+        generator = random.Random(f"{seed}/{sample}")
+        resample = AnonymousProfile(classes.rankings, classes.m, multinomial(generator, n, weights),
+                                    agent_classes, agents, classes.positions, agent_order=False)
+        for rule, winner in evaluate_all(resample, rules, tie_break).items():
+            winner_counts[rule][winner] += 1
+    return winner_counts
+
+def shard_bootstrap_winners(weights, agent_classes, agents, rules, tie_break, seed, start, stop):
+    """
+    Runs bootstrap_winners() on the worker's shared profile of ballot classes.
+
+    Returns:
+        winner_counts (dict): the rule names as keys and Counters of how often each alternative won as values.
+    """
+    return bootstrap_winners(worker_profile, weights, agent_classes, agents, rules, tie_break, seed, start, stop)
+
+def stability(preferences, rules=("plurality", "veto", "borda", "harmonic", "STV"), tie_break="min", samples=1000,
+              seed=None, processes=None, confidence=0.95):
+    """
+    Estimates how robust each rule's winner is by rerunning the rules on bootstrap resamples of the agents.
+
+    Each resample draws n agents with replacement, as multinomial weights over the distinct rankings, and the rules
+    run on those weights (see bootstrap_winners()), so the work of a resample grows with the number of distinct rankings
+    rather than with n. Fractional score vectors such as harmonic are the exception, they add one score per resampled
+    agent so their floating point totals are those of the resampled agents listed ranking by ranking. Every resample has its own seed made from the seed and its number, so the same seed gives the
+    same results however many processes share the work.
+
+    Parameters:
+        preferences (dict/PreferenceProfile): the preferences returned from the generate_preferences() function.
+        rules (list): the names of the rules, any of "plurality", "veto", "borda", "harmonic", "STV", "copeland",
+        "maximin" and "schulze".
+        tie_break (str or int): either "max", "min" or an integer i. If i does not correspond with an agent an exception is raised.
+        samples (int): the number of resamples.
+        seed (int): the seed, by default a random one which is returned so the run can be repeated.
+        processes (int): if more than 1, the resamples are split across a pool of this many processes.
+        confidence (float): the confidence level of the intervals.
+
+    Returns:
+        report (dict): the "seed", the number of "samples", the "winners" of the rules on the preferences themselves,
+        the "frequencies" with which each alternative won each rule and, as the confidence estimate, "intervals" with the
+        Wilson score interval (low, high) of each alternative's probability of winning each rule.
+    """
+    if "range_voting" in rules:
+        raise ValueError("range_voting cannot be resampled from rankings alone.")
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 63)
+    profile = as_profile(preferences)
+    classes = profile if isinstance(profile, AnonymousProfile) else AnonymousProfile.from_profile(profile)
+    rankings = PreferenceProfile(classes.rankings, classes.m, positions=classes.positions)
+    arguments = (classes.weights, classes.agent_classes, classes.agents, list(rules), tie_break, seed)
+    if processes is not None and processes > 1:
+        shards = run_on_shards(rankings, processes, shard_bootstrap_winners,
+                               [arguments + (start, stop) for start, stop in split_range(samples, processes)])
+    else:
+        shards = [bootstrap_winners(rankings, *arguments, 0, samples)]
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    frequencies = {}
+    intervals = {}
+    for rule in rules:
+        wins = reduce(add, (shard[rule] for shard in shards), Counter())
+        frequencies[rule] = {}
+        intervals[rule] = {}
+        for alternative in range(1, classes.m + 1):
+            # The Wilson score interval of the probability the alternative wins.
+            frequency = wins[alternative] / samples
+            centre = (frequency + z * z / (2 * samples)) / (1 + z * z / samples)
+            spread = z * (frequency * (1 - frequency) / samples + z * z / (4 * samples * samples)) ** 0.5 / (1 + z * z / samples)
+            frequencies[rule][alternative] = frequency
+            intervals[rule][alternative] = (max(0.0, centre - spread), min(1.0, centre + spread))
+    return {"seed": seed, "samples": samples, "winners": evaluate_all(preferences, rules, tie_break),
+            "frequencies": frequencies, "intervals": intervals}
@@ -0,0 +1,178 @@
+# Runs voting rules over every sheet of a batch of workbooks, across a process pool.
+#
+# Usage:
+#     python voting_batch.py "elections/*.xlsx" --rules plurality borda STV --output results.csv
+#     python voting_batch.py "elections/**/*.xlsx" --processes 8 --output results.jsonl
+#
+# There is one result row per sheet and rule, written as each workbook finishes, as CSV or as JSON lines
+# depending on the output file's extension (or --format). A sheet or workbook which cannot be read or counted
+# gets a row with its error instead, the rest of the batch carries on and the exit status is 1.
+# openpyxl is only imported by the worker processes when they open a workbook.
+
+import argparse
+import csv
+import glob
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import voting
+
+COLUMNS = ("workbook", "sheet", "agents", "alternatives", "rule", "winner", "error")
+
+def describe_error(error):
+    """
+    Describes an exception for the error column.
+
+    Parameters:
+        error (Exception): the exception.
+
+    Returns:
+        description (str): the exception's type and message.
+    """
+    return f"{type(error).__name__}: {error}"
+
+def count_workbook(filename, rules, tie_break):
+    """
+    Runs the rules on every sheet of one workbook, reading each sheet once.
+
+    An error in one sheet is recorded in that sheet's row and the next sheet is still counted.
+
+    Parameters:
+        filename (str): the path of the .xlsx file.
+        rules (list): the names of the rules, as in voting.evaluate_all().
+        tie_break (str or int): either "max", "min" or an integer i.
+
+    Returns:
+        rows (list): a dictionary with the COLUMNS as keys for each sheet and rule, or one row with the error
+        if the workbook itself cannot be opened.
+    """
+    try:
+        workbook = voting.open_worksheet(filename).parent
+    except Exception as error:
+        return [dict.fromkeys(COLUMNS, None) | {"workbook": filename, "error": describe_error(error)}]
+    rows = []
+    try:
+        for values in workbook.worksheets:
+            try:
+                profile = voting.stream_preferences(values)
+                winners = voting.evaluate_all(profile, rules, tie_break)
+            except Exception as error:
+                rows.append(dict.fromkeys(COLUMNS, None) | {"workbook": filename, "sheet": values.title,
+                                                            "error": describe_error(error)})
+                continue
+            for rule in rules:
+                rows.append({"workbook": filename, "sheet": values.title, "agents": profile.n, "alternatives": profile.m,
+                             "rule": rule, "winner": winners[rule], "error": None})
+    finally:
+        workbook.close()
+    return rows
+
+def find_workbooks(patterns):
+    """
+    Expands glob patterns into a sorted list of workbooks, each listed once.
+
+    Parameters:
+        patterns (list): the glob patterns, "**" matches any number of directories.
+
+    Returns:
+        filenames (list): the matching paths.
+    """
+    return sorted(set(filename for pattern in patterns for filename in glob.glob(pattern, recursive=True)))
+
+def run(filenames, rules, tie_break, processes=None):
+    """
+    Counts every sheet of every workbook, one workbook per task.
+
+    Parameters:
+        filenames (list): the paths of the .xlsx files.
+        rules (list): the names of the rules, as in voting.evaluate_all().
+        tie_break (str or int): either "max", "min" or an integer i.
+        processes (int): the number of worker processes, by default one per CPU. With 1 the workbooks are counted in this process.
+
+    Yields:
+        row (dict): a dictionary with the COLUMNS as keys, in the order of the filenames.
+    """
+    if processes == 1:
+        for filename in filenames:
+            yield from count_workbook(filename, rules, tie_break)
+        return
+    with ProcessPoolExecutor(processes) as executor:
+        for rows in executor.map(count_workbook, filenames, [rules] * len(filenames), [tie_break] * len(filenames)):
+            yield from rows
+
+def write_rows(rows, file, output_format):
+    """
+    Writes the rows as they arrive.
+
+    Parameters:
+        rows (iterable): the rows from run().
+        file (file): a file opened for writing text.
+        output_format (str): "csv" or "jsonl".
+
+    Returns:
+        errors (int): the number of rows with an error.
+    """
+    errors = 0
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(file, COLUMNS)
+        writer.writeheader()
+    for row in rows:
+        if writer is None:
+            file.write(json.dumps(row) + "\n")
+        else:
+            writer.writerow(row)
+        file.flush()
+        if row["error"] is not None:
+            errors += 1
+            print(f"{row['workbook']} {row['sheet'] or ''}: {row['error']}", file=sys.stderr)
+    return errors
+
+def parse_tie_break(tie_break):
+    """
+    Parses a tie-break rule, agent numbers become integers.
+
+    Parameters:
+        tie_break (str): "min", "max" or an agent number.
+
+    Returns:
+        tie_break (str or int): the tie-break rule.
+    """
+    return int(tie_break) if tie_break.isdigit() else tie_break
+
+def main(arguments=None):
+    """
+    Runs the batch from the command line.
+
+    Parameters:
+        arguments (list): the command line arguments, by default sys.argv.
+
+    Returns:
+        status (int): 1 if any workbook or sheet could not be counted, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(description="Run voting rules on every sheet of a batch of workbooks.")
+    parser.add_argument("patterns", nargs="+", help="glob patterns of the .xlsx files, e.g. \"elections/*.xlsx\"")
+    parser.add_argument("--rules", nargs="+", default=["plurality", "veto", "borda", "harmonic", "STV", "range_voting"],
+                        help="the rules to run, any of those voting.evaluate_all() knows")
+    parser.add_argument("--tie-break", type=parse_tie_break, default="min", help="\"min\", \"max\" or an agent number")
+    parser.add_argument("--processes", type=int, help="the number of worker processes, by default one per CPU")
+    parser.add_argument("--output", help="the file to write the results to, by default standard output")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="the output format, by default from the output's extension")
+    arguments = parser.parse_args(arguments)
+    filenames = find_workbooks(arguments.patterns)
+    if not filenames:
+        parser.error("no workbooks match the patterns")
+    output_format = arguments.format
+    if output_format is None:
+        output_format = "jsonl" if arguments.output and arguments.output.endswith((".jsonl", ".json")) else "csv"
+    rows = run(filenames, arguments.rules, arguments.tie_break, arguments.processes)
+    if arguments.output:
+        with open(arguments.output, "w", newline="") as file:
+            errors = write_rows(rows, file, output_format)
+    else:
+        errors = write_rows(rows, sys.stdout, output_format)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# Times and memory-profiles every voting rule over a grid of profile sizes.
+#
+# Usage:
+#     python voting_benchmark.py --sizes 1000x5 10000x5 10000x20 --output benchmark.json
+#     python voting_benchmark.py --sizes 1000x5 10000x5 10000x20 --compare benchmark.json
+#
+# The results are written as JSON. With --compare the new timings are checked against a stored
+# baseline and any rule which became slower than the threshold allows is reported, with exit status 1.
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import voting
+
+def benchmark_rules(n, m, seed):
+    """
+    Builds the functions to benchmark for a profile of n agents and m alternatives.
+
+    The profile is generated with the impartial culture model, the worksheet for generate_preferences
+    and range_voting is an in-memory openpyxl workbook of random values, made only if openpyxl is installed.
+
+    Parameters:
+        n (int): the number of agents.
+        m (int): the number of alternatives.
+        seed (int): the seed of the generated profile and values.
+
+    Returns:
+        rules (dict): the benchmark names as keys and functions taking no arguments as values.
+    """
+    profile = voting.impartial_culture(n, m, seed)
+    score_vector = list(range(m, 0, -1))
+    rules = {"plurality": lambda: voting.plurality(profile, "min"),
+             "veto": lambda: voting.veto(profile, "min"),
+             "borda": lambda: voting.borda(profile, "min"),
+             "harmonic": lambda: voting.harmonic(profile, "min"),
+             "scoring_rule": lambda: voting.scoring_rule(profile, score_vector, "min"),
+             "STV": lambda: voting.STV(profile, "min"),
+             "dictatorship": lambda: voting.dictatorship(profile, 1),
+             "copeland": lambda: voting.copeland(profile, "min"),
+             "maximin": lambda: voting.maximin(profile, "min"),
+             "schulze": lambda: voting.schulze(profile, "min")}
+    try:
+        import openpyxl
+    except ImportError:
+        return rules
+    workbook = openpyxl.Workbook()
+    values = workbook.active
+    generator = random.Random(seed)
+    for agent in range(n):
+        values.append([generator.random() for alternative in range(m)])
+    rules["generate_preferences"] = lambda: voting.generate_preferences(values)
+    rules["range_voting"] = lambda: voting.range_voting(values, "min")
+    return rules
+
+def measure(function, repeats):
+    """
+    Times a function and measures the peak memory it allocates.
+
+    Parameters:
+        function (function): the function, taking no arguments.
+        repeats (int): the number of timed runs, the fastest is kept.
+
+    Returns:
+        (seconds, peak_bytes) (tuple): the fastest wall time and the peak traced allocation of one extra run.
+    """
+    seconds = None
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+    tracemalloc.start()
+    function()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak_bytes
+
+def run(sizes, repeats, seed):
+    """
+    Runs the benchmark over every size in the grid.
+
+    Parameters:
+        sizes (list): the (n, m) pairs.
+        repeats (int): the number of timed runs of each rule.
+        seed (int): the seed of the generated profiles.
+
+    Returns:
+        results (dict): the environment and a list of results, one per rule and size.
+    """
+    results = []
+    for n, m in sizes:
+        for rule, function in benchmark_rules(n, m, seed).items():
+            seconds, peak_bytes = measure(function, repeats)
+            results.append({"rule": rule, "n": n, "m": m, "seconds": seconds, "peak_bytes": peak_bytes})
+            print(f"{rule:>20} n={n:<9} m={m:<5} {seconds:10.4f}s {peak_bytes / 1e6:10.2f}MB")
+    return {"python": platform.python_version(), "platform": platform.platform(), "seed": seed, "results": results}
+
+def compare(results, baseline, threshold):
+    """
+    Finds the rules which became slower than a baseline allows.
+
+    Parameters:
+        results (dict): the results of run().
+        baseline (dict): earlier results of run(), loaded from JSON.
+        threshold (float): the largest allowed ratio of new to baseline time, e.g. 1.25 for 25% slower.
+
+    Returns:
+        slowdowns (list): a dictionary for each rule and size slower than the threshold.
+    """
+    baseline_seconds = {(result["rule"], result["n"], result["m"]): result["seconds"] for result in baseline["results"]}
+    slowdowns = []
+    for result in results["results"]:
+        key = (result["rule"], result["n"], result["m"])
+        if key in baseline_seconds and baseline_seconds[key] > 0:
+            ratio = result["seconds"] / baseline_seconds[key]
+            if ratio > threshold:
+                slowdowns.append({"rule": result["rule"], "n": result["n"], "m": result["m"],
+                                  "baseline_seconds": baseline_seconds[key], "seconds": result["seconds"], "ratio": ratio})
+    return slowdowns
+
+def parse_size(size):
+    """
+    Parses a size such as "10000x5" into (n, m).
+
+    Parameters:
+        size (str): the number of agents and alternatives separated by an x.
+
+    Returns:
+        (n, m) (tuple): the number of agents and the number of alternatives.
+    """
+    n, m = size.lower().split("x")
+    return int(n), int(m)
+
+def main(arguments=None):
+    """
+    Runs the benchmark from the command line.
+
+    Parameters:
+        arguments (list): the command line arguments, by default sys.argv.
+
+    Returns:
+        status (int): 1 if --compare found a slowdown, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the voting rules over a grid of profile sizes.")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(1000, 4), (10000, 4), (10000, 10), (100000, 5)],
+                        help="the profile sizes as NxM, e.g. 10000x5")
+    parser.add_argument("--repeats", type=int, default=3, help="the number of timed runs of each rule")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the generated profiles")
+    parser.add_argument("--output", help="the JSON file to write the results to")
+    parser.add_argument("--compare", help="a JSON file of earlier results to check for slowdowns against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="the allowed ratio of new to baseline time")
+    arguments = parser.parse_args(arguments)
+    results = run(arguments.sizes, arguments.repeats, arguments.seed)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        slowdowns = compare(results, baseline, arguments.threshold)
+        for slowdown in slowdowns:
+            print(f"SLOWER {slowdown['rule']} n={slowdown['n']} m={slowdown['m']}: "
+                  f"{slowdown['baseline_seconds']:.4f}s -> {slowdown['seconds']:.4f}s ({slowdown['ratio']:.2f}x)")
+        if slowdowns:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# Generates load on a voting_server.py server and reports its throughput and latency.
+#
+# Usage:
+#     python voting_load.py --alternatives 5 --ballots 100000 --connections 8
+#     python voting_load.py --alternatives 5 --ballots 100000 --port 8765
+#
+# Without --port a server is started in this process on a free port. Each connection sends its share of
+# the ballots with up to --window requests waiting at once, and every --query-every ballots it also asks
+# for the winner of one of the --rules. The latency of each request is the time from sending it to its response.
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import voting_server
+
+def percentile(latencies, fraction):
+    """
+    Finds a percentile of the latencies.
+
+    Parameters:
+        latencies (list): the sorted latencies.
+        fraction (float): e.g. 0.99 for the 99th percentile.
+
+    Returns:
+        latency (float): the latency, or None if there are none.
+    """
+    if not latencies:
+        return None
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+async def load_connection(client, agents, m, window, query_every, rules, seed, ballot_latencies, query_latencies):
+    """
+    Sends one connection's ballots and winner queries.
+
+    Parameters:
+        client (Client or LocalClient): the connected client.
+        agents (range): the agents whose ballots this connection sends.
+        m (int): the number of alternatives.
+        window (int): the most requests waiting for a response at once.
+        query_every (int): a winner query is sent after this many ballots, 0 for none.
+        rules (list): the rules queried, in turn.
+        seed (int): the seed of the random ballots.
+        ballot_latencies (list): the latency of each ballot is added to it.
+        query_latencies (list): the latency of each query is added to it.
+    """
+    generator = random.Random(seed)
+
+    def requests():
+        alternatives = list(range(1, m + 1))
+        for count, agent in enumerate(agents, 1):
+            generator.shuffle(alternatives)
+            yield {"op": "ballot", "agent": agent, "ranking": list(alternatives)}, ballot_latencies
+            if query_every and count % query_every == 0:
+                yield {"op": "winner", "rule": rules[(count // query_every) % len(rules)], "tie_break": "min"}, query_latencies
+
+    async def sender(pending):
+        # Each sender has one request waiting at a time, so window senders keep window requests waiting.
+        for request, latencies in pending:
+            start = time.perf_counter()
+            response = await client.request(request)
+            latencies.append(time.perf_counter() - start)
+            if not response["ok"]:
+                raise RuntimeError(response["error"])
+
+    pending = requests()
+    await asyncio.gather(*(sender(pending) for slot in range(window)))
+
+async def run(m, ballots, connections, window, query_every, rules, seed, host=None, port=None, local=False):
+    """
+    Runs the load and measures it.
+
+    Parameters:
+        m (int): the number of alternatives.
+        ballots (int): the total number of ballots sent.
+        connections (int): the number of connections, each sending an equal share of the ballots.
+        window (int): the most requests waiting for a response at once on each connection.
+        query_every (int): each connection sends a winner query after this many ballots, 0 for none.
+        rules (list): the rules queried, in turn.
+        seed (int): the seed of the random ballots.
+        host (str): the server's address, used with port.
+        port (int): the port of a running server, by default a server is started in this process.
+        local (bool): if True the in-process server is called directly by LocalClients rather than over sockets.
+
+    Returns:
+        report (dict): the requests, seconds, requests per second and the p50 and p99 latencies of ballots and queries.
+    """
+    server = None
+    if port is None:
+        server = voting_server.ElectionServer(m)
+        port = await server.start(host, None if local else 0)
+        host = "127.0.0.1"
+    clients = []
+    for connection in range(connections):
+        if local:
+            client = voting_server.LocalClient(server)
+        else:
+            client = voting_server.Client(host, port)
+            await client.connect()
+        clients.append(client)
+    ballot_latencies = []
+    query_latencies = []
+    share = -(-ballots // connections)
+    start = time.perf_counter()
+    await asyncio.gather(*(load_connection(client, range(1 + index * share, 1 + min(ballots, (index + 1) * share)), m, window,
+                                           query_every, rules, seed + index, ballot_latencies, query_latencies)
+                           for index, client in enumerate(clients)))
+    seconds = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    if server is not None:
+        await server.close()
+    ballot_latencies.sort()
+    query_latencies.sort()
+    requests = len(ballot_latencies) + len(query_latencies)
+    return {"requests": requests, "seconds": seconds, "requests_per_second": requests / seconds,
+            "ballot_p50": percentile(ballot_latencies, 0.5), "ballot_p99": percentile(ballot_latencies, 0.99),
+            "query_p50": percentile(query_latencies, 0.5), "query_p99": percentile(query_latencies, 0.99)}
+
+def main(arguments=None):
+    """
+    Runs the load from the command line and prints the report.
+
+    Parameters:
+        arguments (list): the command line arguments, by default sys.argv.
+
+    Returns:
+        status (int): 0.
+    """
+    parser = argparse.ArgumentParser(description="Generate load on a voting server and report throughput and latency.")
+    parser.add_argument("--alternatives", type=int, default=5, help="the number of alternatives")
+    parser.add_argument("--ballots", type=int, default=20000, help="the total number of ballots sent")
+    parser.add_argument("--connections", type=int, default=4, help="the number of connections")
+    parser.add_argument("--window", type=int, default=64, help="the most requests waiting at once on each connection")
+    parser.add_argument("--query-every", type=int, default=100, help="a winner query after this many ballots, 0 for none")
+    parser.add_argument("--rules", nargs="+", default=["plurality", "borda", "STV"], help="the rules queried, in turn")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random ballots")
+    parser.add_argument("--host", default="127.0.0.1", help="the address of a running server")
+    parser.add_argument("--port", type=int, help="the port of a running server, by default one is started in this process")
+    parser.add_argument("--local", action="store_true", help="call the in-process server directly rather than over sockets")
+    arguments = parser.parse_args(arguments)
+    report = asyncio.run(run(arguments.alternatives, arguments.ballots, arguments.connections, arguments.window,
+                             arguments.query_every, arguments.rules, arguments.seed, arguments.host, arguments.port, arguments.local))
+    print(f"{report['requests']} requests in {report['seconds']:.3f}s, {report['requests_per_second']:.0f} requests/s")
+    for kind in ("ballot", "query"):
+        if report[f"{kind}_p50"] is not None:
+            print(f"{kind:>7} latency p50 {report[f'{kind}_p50'] * 1000:.2f}ms p99 {report[f'{kind}_p99'] * 1000:.2f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+# Serves live winners while ballots arrive, over a local TCP socket speaking JSON lines.
+#
+# Usage:
+#     python voting_server.py --alternatives 5 --port 8765
+#
+# Each request is one JSON object on one line, and each response is one JSON object on one line with the
+# request's "id" (if it had one) and "ok". The requests are:
+#     {"id": 1, "op": "ballot", "agent": 7, "ranking": [2, 1, 3]}     adds or replaces agent 7's ballot
+#     {"id": 2, "op": "ballot", "agent": 8, "valuations": [0.5, 0.1, 0.9]}
+#     {"id": 3, "op": "withdraw", "agent": 7}
+#     {"id": 4, "op": "winner", "rule": "borda", "tie_break": "min"}
+# Ballots are checked as they arrive, then applied to the running totals in micro-batches. Winner queries of
+# rules with running totals are answered straight away, STV and the pairwise rules are worked out in an executor
+# from a snapshot of the ballots, so no query holds up the ballots behind it.
+
+import argparse
+import asyncio
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import voting
+
+# The rules worked out from the whole profile rather than from running totals.
+EXECUTOR_RULES = ("STV", "copeland", "maximin", "schulze")
+
+def executor_winner(preferences, rule, tie_break):
+    """
+    Finds the winner of a rule which needs the whole profile, run in the executor.
+
+    Parameters:
+        preferences (dict): a snapshot of the ballots.
+        rule (str): one of the EXECUTOR_RULES.
+        tie_break (str or int): either "max", "min" or an integer i.
+
+    Returns:
+        winner (int): the winning alternative.
+    """
+    return getattr(voting, rule)(preferences, tie_break)
+
+class ElectionServer:
+    """
+    An election which takes ballots and answers winner queries at the same time.
+
+    Ballots waiting to be applied are kept in a queue. A single batcher task applies everything queued at once,
+    after waiting up to batch_delay seconds for more ballots to arrive, so the running totals are updated in batches
+    of up to batch_size ballots. Each ballot's response is sent once its batch has been applied.
+
+    Parameters:
+        m (int): the number of alternatives.
+        batch_size (int): the most ballots applied in one batch.
+        batch_delay (float): the longest a batch waits for more ballots, in seconds.
+        executor (Executor): where STV and the pairwise rules are worked out, by default a process pool made by start().
+        vectors (dict): optional extra score vectors, as in voting.Election.
+    """
+    def __init__(self, m, batch_size=1024, batch_delay=0.001, executor=None, vectors=None):
+        self.election = voting.Election(m, vectors)
+        self.m = m
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.executor = executor
+        self.owns_executor = executor is None
+        self.queue = None
+        self.batcher = None
+        self.server = None
+        self.connections = {}
+        # The number of batches applied, so a winner worked out in the executor can be reused until the next batch.
+        self.version = 0
+        # The (rule, tie_break) pairs as keys and the (version, future) of their latest computation as values.
+        self.executor_winners = {}
+        self.batches = 0
+        self.ballots = 0
+
+    async def start(self, host=None, port=None):
+        """
+        Starts the batcher and, where a port is given, listens for connections.
+
+        Parameters:
+            host (str): the address to listen on, by default localhost.
+            port (int): the port to listen on, 0 picks a free port. With None no socket is opened.
+
+        Returns:
+            port (int): the port listened on, or None.
+        """
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self.apply_batches())
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(1)
+        if port is None:
+            return None
+        self.server = await asyncio.start_server(self.connection, host or "127.0.0.1", port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stops listening, applies any ballots still queued and shuts down the executor if the server made it.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            # Ends each connection's reading, the requests already read are still answered.
+            for reader in self.connections.values():
+                reader.feed_eof()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.queue.join()
+        self.batcher.cancel()
+        if self.owns_executor:
+            self.executor.shutdown()
+
+    def check_agent(self, request):
+        """
+        Checks the agent of a ballot or withdrawal before it is queued.
+
+        Parameters:
+            request (dict): the request.
+
+        Returns:
+            agent (int): the agent, a ValueError is raised if it is not an integer.
+        """
+        agent = request.get("agent")
+        if not isinstance(agent, int) or isinstance(agent, bool):
+            raise ValueError("The agent must be an integer.")
+        return agent
+
+    def check_ballot(self, request):
+        """
+        Checks a ballot before it is queued.
+
+        Parameters:
+            request (dict): the request.
+
+        Returns:
+            ballot (tuple): (agent, ranking, valuations), a ValueError is raised if the ballot is not valid.
+        """
+        agent = self.check_agent(request)
+        ranking = request.get("ranking")
+        valuations = request.get("valuations")
+        if (ranking is None) == (valuations is None):
+            raise ValueError("A ballot must have either a ranking or valuations.")
+        if ranking is not None:
+            if not isinstance(ranking, list) or not all(type(alternative) is int for alternative in ranking) \
+                    or sorted(ranking) != list(range(1, self.m + 1)):
+                raise ValueError(f"A ranking must list the alternatives 1 to {self.m} exactly once.")
+        else:
+            if not isinstance(valuations, list) or len(valuations) != self.m or not all(
+                    type(valuation) in (int, float) and math.isfinite(valuation) for valuation in valuations):
+                raise ValueError(f"Valuations must be {self.m} finite numbers.")
+        return agent, ranking, valuations
+
+    async def apply_batches(self):
+        """
+        Applies the queued ballots to the running totals a batch at a time, for as long as the server runs.
+        """
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_delay and self.queue.qsize() < self.batch_size:
+                await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            for operation, agent, ranking, valuations, future in batch:
+                try:
+                    if operation == "withdraw":
+                        self.election.remove_ballot(agent)
+                    elif agent in self.election.preferences:
+                        self.election.update_ballot(agent, ranking, valuations)
+                    else:
+                        self.election.add_ballot(agent, ranking, valuations)
+                except Exception as error:
+                    # A bad operation only fails its own request, the batcher carries on with the rest.
+                    if not future.done():
+                        future.set_exception(ValueError(f"Agent {agent} has not voted." if isinstance(error, KeyError) else str(error)))
+                else:
+                    self.ballots += 1
+                    if not future.done():
+                        future.set_result(None)
+                self.queue.task_done()
+            self.version += 1
+            self.batches += 1
+
+    async def winner(self, rule, tie_break):
+        """
+        Finds the current winner of a rule from the ballots applied so far.
+
+        Parameters:
+            rule (str): a rule voting.Election knows, or one of the EXECUTOR_RULES.
+            tie_break (str or int): either "max", "min" or an integer i.
+
+        Returns:
+            winner (int): the winning alternative.
+        """
+        if not self.election.preferences:
+            raise ValueError("No ballots have been applied yet.")
+        if rule not in EXECUTOR_RULES:
+            if rule != "range_voting" and rule not in self.election.totals:
+                raise ValueError(f"{rule} is not a rule this server knows.")
+            return self.election.winner(rule, tie_break)
+        # Each rule has at most one computation running. Queries arriving while it runs share the next one,
+        # which starts from the ballots applied by then, and a finished one is reused until the next batch.
+        key = (rule, tie_break)
+        arrived = self.version
+        while True:
+            version, computation = self.executor_winners.get(key, (None, None))
+            if computation is not None and version >= arrived:
+                return await asyncio.shield(computation)
+            if computation is not None and not computation.done():
+                await asyncio.wait([computation])
+                continue
+            computation = asyncio.get_running_loop().run_in_executor(self.executor, executor_winner,
+                                                                     dict(self.election.preferences), rule, tie_break)
+            self.executor_winners[key] = (self.version, computation)
+
+    async def handle(self, request):
+        """
+        Answers one request.
+
+        Parameters:
+            request (dict): the decoded request.
+
+        Returns:
+            response (dict): the response, with "ok" False and an "error" if the request failed.
+        """
+        response = {"id": request.get("id")} if isinstance(request, dict) and "id" in request else {}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+            operation = request.get("op")
+            if operation == "ballot" or operation == "withdraw":
+                if operation == "ballot":
+                    agent, ranking, valuations = self.check_ballot(request)
+                else:
+                    agent, ranking, valuations = self.check_agent(request), None, None
+                future = asyncio.get_running_loop().create_future()
+                self.queue.put_nowait((operation, agent, ranking, valuations, future))
+                await future
+            elif operation == "winner":
+                response["winner"] = await self.winner(request.get("rule"), request.get("tie_break", "min"))
+                response["ballots"] = len(self.election.preferences)
+            elif operation == "stats":
+                response.update(ballots=len(self.election.preferences), applied=self.ballots, batches=self.batches,
+                                queued=self.queue.qsize())
+            else:
+                raise ValueError(f"Unknown op {operation!r}.")
+        except Exception as error:
+            response.update(ok=False, error=f"{type(error).__name__}: {error}")
+            return response
+        response["ok"] = True
+        return response
+
+    async def connection(self, reader, writer):
+        """
+        Serves one connection. Requests on a connection are answered concurrently, each response carries its request's id.
+
+        Parameters:
+            reader (StreamReader): the connection's reader.
+            writer (StreamWriter): the connection's writer.
+        """
+        tasks = set()
+        connection = asyncio.current_task()
+        self.connections[connection] = reader
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                response = {"ok": False, "error": f"JSONDecodeError: {error}"}
+            else:
+                response = await self.handle(request)
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[connection]
+            writer.close()
+
+class LocalClient:
+    """
+    A client which calls a server in the same event loop directly, standing in for a connection in tests.
+
+    Parameters:
+        server (ElectionServer): the started server.
+    """
+    def __init__(self, server):
+        self.server = server
+
+    async def request(self, request):
+        """
+        Parameters:
+            request (dict): the request.
+
+        Returns:
+            response (dict): the response.
+        """
+        return await self.server.handle(request)
+
+    async def close(self):
+        pass
+
+class Client:
+    """
+    A client for a server's socket, which can have many requests waiting for their responses at once.
+
+    Parameters:
+        host (str): the server's address.
+        port (int): the server's port.
+    """
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.waiting = {}
+        self.next_id = 0
+        self.responses = None
+
+    async def connect(self):
+        """
+        Opens the connection.
+        """
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.responses = asyncio.create_task(self.read_responses())
+
+    async def read_responses(self):
+        """
+        Hands each response to the request waiting for it.
+        """
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("The server closed the connection."))
+
+    async def request(self, request):
+        """
+        Sends a request and waits for its response.
+
+        Parameters:
+            request (dict): the request, an "id" is added to it.
+
+        Returns:
+            response (dict): the response.
+        """
+        self.next_id += 1
+        request = dict(request, id=self.next_id)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_id] = future
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.responses.cancel()
+
+async def serve(m, host, port, batch_size, batch_delay):
+    """
+    Runs a server until it is interrupted.
+
+    Parameters:
+        m (int): the number of alternatives.
+        host (str): the address to listen on.
+        port (int): the port to listen on.
+        batch_size (int): the most ballots applied in one batch.
+        batch_delay (float): the longest a batch waits for more ballots, in seconds.
+    """
+    server = ElectionServer(m, batch_size, batch_delay)
+    port = await server.start(host, port)
+    print(f"Serving {m} alternatives on {host}:{port}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+def main(arguments=None):
+    """
+    Runs the server from the command line.
+
+    Parameters:
+        arguments (list): the command line arguments, by default sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Serve live winners over a local socket while ballots arrive.")
+    parser.add_argument("--alternatives", type=int, required=True, help="the number of alternatives")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="the port to listen on")
+    parser.add_argument("--batch-size", type=int, default=1024, help="the most ballots applied in one batch")
+    parser.add_argument("--batch-delay", type=float, default=0.001, help="the longest a batch waits for more ballots, in seconds")
+    arguments = parser.parse_args(arguments)
+    try:
+        asyncio.run(serve(arguments.alternatives, arguments.host, arguments.port, arguments.batch_size, arguments.batch_delay))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
-# Imports the Python file.
+# Imports the Python files.
 import voting as voting
+import voting_batch
+import voting_server
 
 # Imports the openpyxl library.
 import openpyxl
 
+import asyncio
+import os
+import tempfile
+import time
+
 # Opens the voting_2.xlsx workbook.
 workbook = openpyxl.load_workbook("voting_2.xlsx")
 
@@ -70,6 +77,14 @@ def test_2d_STV():
     print("Actual Output:", actual_output)
 
 # test_2d_STV()
+
+def test_3_STV():
+    expected_output = (4, [{1: 0, 2: 0, 3: 2, 4: 2}])
+    print("Expected Output:", expected_output, stv_test_2_values)
+    actual_output = voting.STV(stv_test_2_values, "max", rounds=True)
+    print("Actual Output:", actual_output, stv_test_2_values)
+
+# test_3_STV()
     
 # Scoring Rule Testing
     
@@ -169,4 +184,404 @@ def test_range_voting():
     actual_output = voting.range_voting(values, 7)
     print("Actual Output:", actual_output)
     
-# test_range_voting()
\ No newline at end of file
+# test_range_voting()
+
+# Preference Profile Testing
+
+def test_1_preference_profile():
+    expected_output = {1: [1, 4, 3, 2], 2: [2, 1, 4, 3], 3: [1, 4, 3, 2], 4: [4, 3, 2, 1], 5: [4, 3, 2, 1], 6: [4, 3, 2, 1]}
+    print("Expected Output:", expected_output)
+    actual_output = voting.generate_preferences(values, profile=True)
+    print("Actual Output:", actual_output.to_dict())
+    print("Positions of agent 1's alternatives:", [actual_output.position(1, alternative) for alternative in range(1, 5)])
+
+# test_1_preference_profile()
+
+def test_2_preference_profile():
+    expected_output = 4
+    print("Expected Output:", expected_output)
+    actual_output = voting.borda(voting.PreferenceProfile.from_dict(borda_test_1_values), 4)
+    print("Actual Output:", actual_output)
+
+# test_2_preference_profile()
+
+# Positional Tally Testing
+
+def test_1_positional_tally():
+    expected_output = {1: 6, 2: 6, 3: 6, 4: 6}
+    print("Expected Output:", expected_output)
+    actual_output = voting.positional_tally(borda_test_1_values, [3, 2, 1, 0])
+    print("Actual Output:", actual_output)
+
+# test_1_positional_tally()
+
+# Streaming Testing
+
+def test_1_stream_preferences():
+    expected_output = {1: 24, 2: 20, 3: 15, 4: 24}
+    print("Expected Output:", expected_output)
+    actual_output = voting.stream_preferences("voting_2.xlsx", chunk_size=4)
+    print("Actual Output:", actual_output.range_totals)
+
+# test_1_stream_preferences()
+
+def test_2_range_voting():
+    expected_output = 4
+    print("Expected Output:", expected_output)
+    actual_output = voting.range_voting("voting_2.xlsx", "max", chunk_size=4)
+    print("Actual Output:", actual_output)
+
+# test_2_range_voting()
+
+# Profile File Testing
+
+def test_1_profile_file():
+    expected_output = (4, {1: 24.0, 2: 20.0, 3: 15.0, 4: 24.0})
+    print("Expected Output:", expected_output)
+    filename = os.path.join(tempfile.gettempdir(), "voting_2.vprf")
+    voting.convert_workbook("voting_2.xlsx", filename)
+    profile = voting.load_profile(filename, verify=True)
+    actual_output = (voting.borda(profile, "max"), profile.range_totals)
+    print("Actual Output:", actual_output)
+
+# test_1_profile_file()
+
+def test_2_profile_file():
+    expected_output = ([10, 20, 30], 3)
+    print("Expected Output:", expected_output)
+    filename = os.path.join(tempfile.gettempdir(), "voting_labels.vprf")
+    voting.save_profile(voting.as_profile({10: [1, 2, 3], 20: [2, 3, 1], 30: [3, 1, 2]}), filename)
+    profile = voting.load_profile(filename, verify=True)
+    actual_output = (list(profile), voting.borda(profile, 30))
+    print("Actual Output:", actual_output)
+
+# test_2_profile_file()
+
+# Evaluate All Testing
+
+def test_1_evaluate_all():
+    expected_output = {"plurality": 1, "veto": 1, "borda": 1, "harmonic": 2, "STV": 1}
+    print("Expected Output:", expected_output)
+    actual_output = voting.evaluate_all(harmonic_test_1_values, ("plurality", "veto", "borda", "harmonic", "STV"), "min")
+    print("Actual Output:", actual_output)
+
+# test_1_evaluate_all()
+
+def test_2_evaluate_all():
+    expected_output = ({"plurality": 1, "veto": 1, "borda": 1, "harmonic": 2, "STV": 1}, 1)
+    print("Expected Output:", expected_output)
+    actual_output = (voting.evaluate_all(harmonic_test_1_values), voting.evaluate_all("voting_2.xlsx")["range_voting"])
+    print("Actual Output:", actual_output)
+
+# test_2_evaluate_all()
+
+def test_3_evaluate_all():
+    expected_output = ({"plurality": 1, "veto": 1, "borda": 1, "harmonic": 2, "STV": 1, "copeland": 1}, 1)
+    print("Expected Output:", expected_output)
+    # Counts how many times the dictionary is put into a profile, every rule should share one.
+    from_dict = voting.PreferenceProfile.from_dict
+    calls = []
+    def counting_from_dict(preferences):
+        calls.append(preferences)
+        return from_dict(preferences)
+    voting.PreferenceProfile.from_dict = counting_from_dict
+    try:
+        winners = voting.evaluate_all(harmonic_test_1_values, ("plurality", "veto", "borda", "harmonic", "STV", "copeland"))
+    finally:
+        voting.PreferenceProfile.from_dict = from_dict
+    actual_output = (winners, len(calls))
+    print("Actual Output:", actual_output)
+
+# test_3_evaluate_all()
+
+# Pairwise Testing
+
+pairwise_test_1_values = {1: [1, 2, 3],
+                          2: [1, 3, 2],
+                          3: [2, 3, 1],
+                          4: [3, 1, 2],
+                          5: [2, 1, 3]}
+
+def test_1_pairwise():
+    expected_output = (1, 1, 1, 1)
+    print("Expected Output:", expected_output)
+    actual_output = (voting.condorcet_winner(pairwise_test_1_values), voting.copeland(pairwise_test_1_values, "max"),
+                     voting.maximin(pairwise_test_1_values, "max"), voting.schulze(pairwise_test_1_values, "max"))
+    print("Actual Output:", actual_output)
+
+# test_1_pairwise()
+
+# Parallel Testing
+
+def test_1_parallel():
+    expected_output = (voting.borda(borda_test_1_values, 4), voting.harmonic(harmonic_test_1_values, "min"))
+    print("Expected Output:", expected_output)
+    actual_output = (voting.borda(borda_test_1_values, 4, processes=2), voting.harmonic(harmonic_test_1_values, "min", processes=2))
+    print("Actual Output:", actual_output)
+
+# if __name__ == "__main__":
+#     test_1_parallel()
+
+# Election Testing
+
+def test_1_election():
+    expected_output = (4, 1)
+    print("Expected Output:", expected_output)
+    election = voting.Election(4)
+    for agent in borda_test_1_values:
+        election.add_ballot(agent, borda_test_1_values[agent])
+    borda_winner = election.winner("borda", 4)
+    election.update_ballot(4, [1, 4, 2, 3])
+    election.remove_ballot(3)
+    actual_output = (borda_winner, election.winner("plurality", "min"))
+    print("Actual Output:", actual_output)
+
+# test_1_election()
+
+# Anonymous Profile Testing
+
+def test_1_anonymous_profile():
+    expected_output = (3, [2, 1, 3], 4, 1)
+    print("Expected Output:", expected_output)
+    profile = voting.stream_preferences("voting_2.xlsx", anonymous=True)
+    actual_output = (profile.rows, list(profile.weights), voting.borda(profile, 2), voting.STV(profile, 2))
+    print("Actual Output:", actual_output)
+
+# test_1_anonymous_profile()
+
+def test_2_anonymous_profile():
+    expected_output = (3, [2, 1, 3], 4)
+    print("Expected Output:", expected_output)
+    profile = voting.AnonymousProfile.from_profile(voting.stream_preferences("voting_2.xlsx", anonymous=True))
+    actual_output = (profile.rows, list(profile.weights), voting.borda(profile, 2))
+    print("Actual Output:", actual_output)
+
+# test_2_anonymous_profile()
+
+def test_3_anonymous_profile():
+    expected_output = (1, 1)
+    print("Expected Output:", expected_output)
+    # Alternatives 1 and 2 both score exactly 16/3, the float totals decide the tie the same way for both profiles.
+    preferences = {1: [1, 3, 2], 2: [2, 3, 1], 3: [2, 3, 1], 4: [2, 3, 1], 5: [2, 3, 1], 6: [1, 3, 2], 7: [1, 3, 2], 8: [1, 3, 2]}
+    actual_output = (voting.harmonic(preferences, "max"), voting.harmonic(voting.AnonymousProfile.from_profile(preferences), "max"))
+    print("Actual Output:", actual_output)
+
+# test_3_anonymous_profile()
+
+# Generator Testing
+
+def test_1_generators():
+    expected_output = (True, [1, 2, 3, 4], 8)
+    print("Expected Output:", expected_output)
+    same_seed = voting.impartial_culture(100, 4, seed=1) == voting.impartial_culture(100, 4, seed=1)
+    reference_ranking = voting.mallows(10, 4, 0, seed=1)[10]
+    single_peaked_rankings = len(set(tuple(ranking) for ranking in voting.single_peaked(1000, 4, seed=1).values()))
+    actual_output = (same_seed, reference_ranking, single_peaked_rankings)
+    print("Actual Output:", actual_output)
+
+# test_1_generators()
+
+# Valuation Ranking Testing
+
+def test_1_valuations_to_preferences():
+    expected_output = [2, 4, 3, 1]
+    print("Expected Output:", expected_output)
+    actual_output = voting.valuations_to_preferences((1, 5, 1, 2))
+    print("Actual Output:", actual_output)
+
+# test_1_valuations_to_preferences()
+
+# Simulation Testing
+
+def test_1_simulate():
+    expected_output = (100, 1.0)
+    print("Expected Output:", expected_output)
+    results = voting.simulate(100, 9, 3, rules=("borda", "copeland"), model="mallows", model_parameters=(0,), seed=1,
+                              condorcet=True)
+    actual_output = (results["winner_counts"]["borda"][1], results["condorcet_efficiency"]["copeland"])
+    print("Actual Output:", actual_output)
+
+# test_1_simulate()
+
+# Cache Testing
+
+def test_1_profile_cache():
+    expected_output = ({"winner": 4, "tally": [[1, 8], [2, 6], [3, 8], [4, 14]]}, True)
+    print("Expected Output:", expected_output)
+    cache = voting.ProfileCache(os.path.join(tempfile.gettempdir(), "voting_cache"))
+    first = cache.rule("voting_2.xlsx", "borda", 2)
+    second = voting.ProfileCache(cache.directory).rule("voting_2.xlsx", "borda", 2)
+    actual_output = (second, first == second)
+    print("Actual Output:", actual_output)
+
+# test_1_profile_cache()
+
+def test_2_profile_cache():
+    expected_output = (4, ["notes.txt", "sub"])
+    print("Expected Output:", expected_output)
+    directory = tempfile.mkdtemp()
+    with open(os.path.join(directory, "notes.txt"), "w") as file:
+        file.write("not a cache entry")
+    os.mkdir(os.path.join(directory, "sub"))
+    cache = voting.ProfileCache(directory, max_bytes=10)
+    actual_output = (cache.rule("voting_2.xlsx", "borda", 2)["winner"], sorted(os.listdir(directory)))
+    print("Actual Output:", actual_output)
+
+# test_2_profile_cache()
+
+def test_3_profile_cache():
+    expected_output = (4, [".vprf-fresh.tmp", "notes.tmp"])
+    print("Expected Output:", expected_output)
+    directory = tempfile.mkdtemp()
+    for name in (".vprf-abandoned.tmp", ".vprf-fresh.tmp", "notes.tmp"):
+        with open(os.path.join(directory, name), "w") as file:
+            file.write("a write which never finished")
+    # The abandoned temporary file was last written two hours ago.
+    os.utime(os.path.join(directory, ".vprf-abandoned.tmp"), (0, time.time() - 7200))
+    cache = voting.ProfileCache(directory, max_bytes=10)
+    actual_output = (cache.rule("voting_2.xlsx", "borda", 2)["winner"], sorted(os.listdir(directory)))
+    print("Actual Output:", actual_output)
+
+# test_3_profile_cache()
+
+# Social Ranking Testing
+
+def test_1_social_ranking():
+    expected_output = ([4, 1, 3, 2], [4, 1], [1, 4, 2, 3])
+    print("Expected Output:", expected_output)
+    preferences = voting.generate_preferences(values)
+    borda_ranking = voting.social_ranking(preferences, "borda", "min")
+    top_two = voting.social_ranking(preferences, "borda", "min", k=2)
+    stv_ranking = voting.social_ranking(preferences, "STV", "min")
+    actual_output = (borda_ranking, top_two, stv_ranking)
+    print("Actual Output:", actual_output)
+
+# test_1_social_ranking()
+
+# Manipulation Testing
+
+def test_1_manipulation_analysis():
+    expected_output = (4, [4, 5, 6], {})
+    print("Expected Output:", expected_output)
+    preferences = voting.generate_preferences(values)
+    analysis = voting.manipulation_analysis(preferences, "min", rules=("borda",))["borda"]
+    actual_output = (analysis["winner"], analysis["pivotal"], analysis["manipulations"])
+    print("Actual Output:", actual_output)
+
+# test_1_manipulation_analysis()
+
+# Instrumentation Testing
+
+def test_1_instrumentation():
+    expected_output = (1, {"stv_rounds": 3, "stv_eliminated": 2, "ties": 1, "ties_min": 1}, None)
+    print("Expected Output:", expected_output)
+    preferences = voting.generate_preferences(values)
+    collector = voting.enable_instrumentation()
+    voting.STV(preferences, "min")
+    voting.disable_instrumentation()
+    actual_output = (collector.to_dict()["phases"]["STV"]["calls"], collector.to_dict()["counters"], voting.instrumentation)
+    print("Actual Output:", actual_output)
+
+# test_1_instrumentation()
+
+# Batch Testing
+
+def test_1_count_workbook():
+    expected_output = [("Sheet1", "borda", 4, None), ("Sheet1", "STV", 1, None), (None, None, None, "BadZipFile: File is not a zip file")]
+    print("Expected Output:", expected_output)
+    filename = os.path.join(tempfile.gettempdir(), "not_a_workbook.xlsx")
+    with open(filename, "w") as file:
+        file.write("not a workbook")
+    rows = list(voting_batch.run(["voting_2.xlsx", filename], ["borda", "STV"], "min", processes=1))
+    actual_output = [(row["sheet"], row["rule"], row["winner"], row["error"]) for row in rows]
+    print("Actual Output:", actual_output)
+
+# test_1_count_workbook()
+
+# Server Testing
+
+def test_1_election_server():
+    expected_output = ([True, True, True, False, False], {"id": 5, "winner": 4, "ballots": 3, "ok": True}, 1)
+    print("Expected Output:", expected_output)
+
+    async def session():
+        server = voting_server.ElectionServer(4)
+        await server.start()
+        client = voting_server.LocalClient(server)
+        ballots = [{"op": "ballot", "agent": 1, "ranking": [1, 4, 3, 2]},
+                   {"op": "ballot", "agent": 2, "valuations": [2, 5, 1, 3]},
+                   {"op": "ballot", "agent": 3, "ranking": [4, 3, 2, 1]},
+                   {"op": "ballot", "agent": 4, "ranking": [4, 4, 2, 1]},
+                   {"op": "withdraw", "agent": [1]}]
+        responses = await asyncio.gather(*(client.request(ballot) for ballot in ballots))
+        borda = await client.request({"id": 5, "op": "winner", "rule": "borda", "tie_break": "min"})
+        stv = await client.request({"op": "winner", "rule": "STV", "tie_break": "min"})
+        await server.close()
+        return [response["ok"] for response in responses], borda, stv["winner"]
+
+    actual_output = asyncio.run(session())
+    print("Actual Output:", actual_output)
+
+# test_1_election_server()
+
+# Exact Scoring Testing
+
+def test_1_exact_harmonic():
+    expected_output = (2, 1)
+    print("Expected Output:", expected_output)
+    # Alternatives 1 and 2 both score exactly 10/3, but the float totals differ in the last bit.
+    preferences = {1: [1, 2, 3], 2: [2, 1, 3], 3: [3, 2, 1], 4: [1, 3, 2], 5: [2, 1, 3]}
+    actual_output = (voting.harmonic(preferences, "min"), voting.harmonic(preferences, "min", exact=True))
+    print("Actual Output:", actual_output)
+
+# test_1_exact_harmonic()
+
+# Truncated Ballot Testing
+
+def test_1_truncated_profile():
+    expected_output = (2, {1: 1, 2: 3, 3: 2, 4: 2, 5: 1}, 2, (2, [{1: 1, 2: 2, 3: 1, 4: 1, 5: 0}, {1: 1, 2: 2, 3: 1, 4: 1}]))
+    print("Expected Output:", expected_output)
+    preferences = voting.TruncatedProfile.from_dict({1: [2, 4], 2: [1], 3: [4, 2, 3], 4: [2], 5: [3, 5]}, 5)
+    actual_output = (voting.plurality(preferences, "min"), voting.positional_tally(preferences, voting.score_vectors(5)["veto"]),
+                     voting.borda(preferences, "min"), voting.STV(preferences, 3, rounds=True))
+    print("Actual Output:", actual_output)
+
+# test_1_truncated_profile()
+
+def test_2_truncated_profile():
+    expected_output = (1, 1)
+    print("Expected Output:", expected_output)
+    preferences = voting.TruncatedProfile.from_dict({1: [2, 1], 2: [1], 3: [3, 2]}, 3)
+    full_preferences = {1: [2, 1, 3], 2: [1, 2, 3], 3: [3, 2, 1]}
+    actual_output = (voting.scoring_rule(preferences, [float("inf"), 1, 0], "min", exact=True),
+                     voting.scoring_rule(full_preferences, [float("inf"), 1, 0], "min", exact=True))
+    print("Actual Output:", actual_output)
+
+# test_2_truncated_profile()
+
+# Committee Testing
+
+def test_1_committees():
+    expected_output = ([4, 1], [4, 1], [4, 1], [4, 1], [4, 1])
+    print("Expected Output:", expected_output)
+    preferences = voting.generate_preferences(values)
+    actual_output = (voting.k_borda(preferences, 2, "min"), voting.bloc(preferences, 2, "min"),
+                     voting.stv_committee(preferences, 2, "min"), voting.greedy_chamberlin_courant(preferences, 2, "min"),
+                     voting.greedy_pav(preferences, 2, "min"))
+    print("Actual Output:", actual_output)
+
+# test_1_committees()
+
+# Stability Testing
+
+def test_1_stability():
+    expected_output = (4, True, True)
+    print("Expected Output:", expected_output)
+    preferences = voting.generate_preferences(values)
+    report = voting.stability(preferences, rules=("borda", "STV"), samples=200, seed=1)
+    low, high = report["intervals"]["borda"][4]
+    actual_output = (report["winners"]["borda"], low <= report["frequencies"]["borda"][4] <= high,
+                     report == voting.stability(preferences, rules=("borda", "STV"), samples=200, seed=1))
+    print("Actual Output:", actual_output)
+
+# test_1_stability()